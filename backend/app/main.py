@@ -1,11 +1,46 @@
+import time
+_import_start = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import analyze_router
+from app.routers import analyze_router, health_router, metrics_router
+from app.services.analysis_pool import analysis_pool
+from app.services.decoder_pool import decoder_pool
+from app.services.job_queue import job_queue
+from app.services.startup import startup
+from app.utils.request_limits import BodySizeLimitMiddleware
+
+# Importing the routers pulls in parselmouth, pandas, xgboost and lightgbm
+startup.record_imports(_import_start)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await job_queue.start()
+    decoder_pool.start()
+    # Warm-up runs in the background: /healthz answers right away,
+    # /readyz once the model and the analysis workers are warm.
+    warm_up = asyncio.create_task(startup.warm_up())
+    yield
+    warm_up.cancel()
+    with suppress(asyncio.CancelledError):
+        await warm_up
+    await job_queue.stop()
+    decoder_pool.shutdown()
+    analysis_pool.shutdown()
+
 
 app = FastAPI(
     title = "Parkinson's disease prediction API",
+    lifespan=lifespan,
 )
 
+# Middleware added last runs first: CORS wraps the body size limit, so its
+# 413 responses carry the CORS headers the browser needs to read them.
+app.add_middleware(BodySizeLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  
@@ -16,6 +51,8 @@ app.add_middleware(
 
 
 app.include_router(analyze_router.router)
+app.include_router(metrics_router.router)
+app.include_router(health_router.router)
 
 @app.get("/")
 def read_root():
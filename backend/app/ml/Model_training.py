@@ -1,8 +1,25 @@
+import argparse
+import hashlib
+import inspect
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+try:
+    import matplotlib
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+except ImportError:  # headless training does not need the plotting stack
+    matplotlib = plt = sns = None
+import sklearn
+from joblib import Parallel, delayed, dump, load, hash as joblib_hash
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split, KFold, ParameterGrid
 from sklearn.preprocessing import StandardScaler, RobustScaler
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor, VotingRegressor
 from sklearn.linear_model import Ridge, Lasso, ElasticNet
@@ -12,18 +29,479 @@ from sklearn.feature_selection import SelectKBest, f_regression, RFE
 import xgboost as xgb
 import lightgbm as lgb
 import warnings
+from app.ml.model_bundle import write_bundle
+from app.ml.model_registry import MODEL_VERSION_NAME, write_model_version
 warnings.filterwarnings('ignore')
 
 # Set style for plots
-sns.set_style("whitegrid")
-sns.set_palette("husl")
+if sns is not None:
+    sns.set_style("whitegrid")
+    sns.set_palette("husl")
+
+ML_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Training data used when none is given on the command line
+DATA_PATH = os.path.join(ML_DIR, 'parkinsons_updrs.csv')
+
+# Where figures, result tables and the model bundle are written. The default
+# is the directory model_predictor loads the served model from.
+TRAINING_OUTPUT_DIR = os.getenv('TRAINING_OUTPUT_DIR', ML_DIR)
+
+FIGURE_DPI = 300
+
+# Total CPU threads training may use: worker processes x threads per process
+TRAINING_THREADS = int(os.getenv('TRAINING_THREADS', str(os.cpu_count() or 1)))
+
+# Worker processes fitting candidate models and CV folds concurrently
+TRAINING_JOBS = int(os.getenv('TRAINING_JOBS', str(TRAINING_THREADS)))
+
+CV_FOLDS = 5
+
+# Hyperparameter search used by optimize_best_models:
+#   'grid'           every combination of the parameter grid (the original behaviour)
+#   'random'         grid combinations in random order
+#   'halving'        successive halving over n_estimators (or training rows)
+#   'early_stopping' boosting models pick n_estimators by early stopping
+SEARCH_STRATEGY = os.getenv('SEARCH_STRATEGY', 'grid')
+SEARCH_STRATEGIES = ('grid', 'random', 'halving', 'early_stopping')
+
+# Search budget per model; 0 means unlimited. Checked between batches of fits.
+SEARCH_TIME_BUDGET = float(os.getenv('SEARCH_TIME_BUDGET', '0'))
+SEARCH_MAX_FITS = int(os.getenv('SEARCH_MAX_FITS', '0'))
+
+# Successive halving keeps the best 1/HALVING_FACTOR of the candidates per round
+HALVING_FACTOR = 3
+
+# Early stopping: upper bound on boosting rounds and patience
+EARLY_STOPPING_MAX_ESTIMATORS = 1000
+EARLY_STOPPING_ROUNDS = 20
+
+# Stage checkpoints of run_complete_pipeline; empty disables them
+TRAINING_CACHE_DIR = os.getenv('TRAINING_CACHE_DIR', os.path.join(ML_DIR, 'training_cache'))
+
+# Part of every checkpoint key. The source of a stage and of the helpers of
+# this module it calls is hashed into its key automatically; bump this when
+# other code (imported modules, libraries) changes results.
+PIPELINE_VERSION = 1
+
+
+def threads_per_job(n_jobs):
+    """Threads each of `n_jobs` worker processes may use within TRAINING_THREADS."""
+    return max(1, TRAINING_THREADS // max(1, n_jobs))
+
+
+def limit_threads(model, threads):
+    """Cap the native threads (n_jobs) of models that have them, e.g. XGBoost / LightGBM / forests."""
+    if 'n_jobs' in model.get_params(deep=False):
+        model.set_params(n_jobs=threads)
+    return model
+
+
+@contextmanager
+def shared_arrays(*arrays):
+    """
+    Write arrays once to a temporary folder and yield read-only memory maps of them.
+
+    Worker processes receiving a memory map only get its file name, so every
+    task reads the same copy from the page cache instead of unpickling its own.
+    """
+    folder = tempfile.mkdtemp(prefix='updrs-training-')
+    try:
+        views = []
+        for i, array in enumerate(arrays):
+            path = os.path.join(folder, f'array_{i}.joblib')
+            dump(np.ascontiguousarray(array), path)
+            views.append(load(path, mmap_mode='r'))
+        yield views
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+
+def fit_candidate(model, X, y, train_index, test_index, threads):
+    """
+    Fit a fresh copy of `model` in a worker process.
+
+    With fold indices, returns the mean squared error on the held-out rows
+    (one cross-validation fold); without, fits on all rows and returns the
+    fitted model.
+    """
+    model = limit_threads(clone(model), threads)
+    if train_index is None:
+        return model.fit(X, y)
+    model.fit(X[train_index], y[train_index])
+    return mean_squared_error(y[test_index], model.predict(X[test_index]))
+
+
+def fit_early_stopping(model, X, y, train_index, test_index, threads):
+    """
+    Fit a boosting model on one CV fold, stopping when it no longer improves.
+
+    The last 10% of the fold's training rows decide when to stop, so the
+    held-out fold stays unseen. Returns (held-out MSE, boosting rounds used).
+    """
+    model = limit_threads(clone(model), threads)
+    n_stop = max(1, len(train_index) // 10)
+    fit_index, stop_index = train_index[:-n_stop], train_index[-n_stop:]
+    eval_set = [(X[stop_index], y[stop_index])]
+
+    if isinstance(model, xgb.XGBRegressor):
+        model.set_params(early_stopping_rounds=EARLY_STOPPING_ROUNDS)
+        model.fit(X[fit_index], y[fit_index], eval_set=eval_set, verbose=False)
+        rounds = model.best_iteration + 1
+    elif isinstance(model, lgb.LGBMRegressor):
+        model.fit(X[fit_index], y[fit_index], eval_set=eval_set,
+                  callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, verbose=False)])
+        rounds = model.best_iteration_ or model.n_estimators
+    else:
+        # GradientBoostingRegressor holds out its own validation fraction
+        model.set_params(n_iter_no_change=EARLY_STOPPING_ROUNDS, validation_fraction=0.1)
+        model.fit(X[train_index], y[train_index])
+        rounds = model.n_estimators_
+    return mean_squared_error(y[test_index], model.predict(X[test_index])), rounds
+
+
+def supports_early_stopping(model):
+    return isinstance(model, (xgb.XGBRegressor, lgb.LGBMRegressor, GradientBoostingRegressor))
+
+
+class SearchBudget:
+    """Wall-clock and fit-count limit of one hyperparameter search (0 = unlimited)."""
+
+    def __init__(self, seconds=SEARCH_TIME_BUDGET, max_fits=SEARCH_MAX_FITS):
+        self.seconds = seconds
+        self.max_fits = max_fits
+        self.fits = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def remaining_fits(self):
+        return math.inf if self.max_fits <= 0 else self.max_fits - self.fits
+
+    def exhausted(self):
+        out_of_time = self.seconds > 0 and self.elapsed >= self.seconds
+        return out_of_time or self.remaining_fits() <= 0
+
+
+def evaluate_candidates(model, candidates, X, y, folds, budget, parallel, threads, task=fit_candidate):
+    """
+    Cross-validate parameter candidates in batches until they run out or the budget does.
+
+    Returns:
+    --------
+    list of dict : {'params', 'mse', 'rounds'} for every fully evaluated
+                   candidate ('rounds' only from fit_early_stopping)
+    """
+    batch_size = max(1, math.ceil(parallel.n_jobs / len(folds)))
+    evaluated = []
+    for start in range(0, len(candidates), batch_size):
+        allowed = budget.remaining_fits() // len(folds)
+        batch = candidates[start:start + min(batch_size, allowed)]
+        if budget.exhausted() or not batch:
+            break
+
+        outputs = parallel(
+            delayed(task)(clone(model).set_params(**params), X, y, train_index, test_index, threads)
+            for params in batch for train_index, test_index in folds
+        )
+        budget.fits += len(outputs)
+
+        for i, params in enumerate(batch):
+            per_fold = outputs[i * len(folds):(i + 1) * len(folds)]
+            if isinstance(per_fold[0], tuple):
+                evaluated.append({'params': params,
+                                  'mse': float(np.mean([mse for mse, _ in per_fold])),
+                                  'rounds': int(round(np.mean([rounds for _, rounds in per_fold])))})
+            else:
+                evaluated.append({'params': params, 'mse': float(np.mean(per_fold))})
+    return evaluated
+
+
+def search_hyperparameters(model, param_grid, X, y, strategy=SEARCH_STRATEGY, budget=None,
+                           random_state=42):
+    """
+    Find good hyperparameters for `model` within a budget, then refit on all rows.
+
+    Parameters:
+    -----------
+    model : estimator
+        Base estimator; candidates are clones with parameters from `param_grid`.
+    param_grid : dict
+        Parameter name -> list of values, as for GridSearchCV.
+    X, y : array-like
+        Training data (ideally memory maps from `shared_arrays`).
+    strategy : str
+        One of SEARCH_STRATEGIES. 'early_stopping' falls back to 'random'
+        for models without early stopping.
+    budget : SearchBudget, optional
+        Time / fit limit; defaults to SEARCH_TIME_BUDGET and SEARCH_MAX_FITS.
+
+    Returns:
+    --------
+    dict : {'model': refitted best model, 'best_params', 'cv_rmse',
+            'strategy', 'fits', 'seconds', 'candidates', 'budget_exhausted'}
+    """
+    if strategy not in SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown search strategy {strategy!r}, expected one of {SEARCH_STRATEGIES}")
+    if strategy == 'early_stopping' and not supports_early_stopping(model):
+        print(f"{type(model).__name__} has no early stopping, using random search")
+        strategy = 'random'
+    budget = budget or SearchBudget()
+
+    folds = list(KFold(n_splits=CV_FOLDS).split(X))
+    n_jobs = max(1, TRAINING_JOBS)
+    threads = threads_per_job(n_jobs)
+    rng = np.random.RandomState(random_state)
+
+    with Parallel(n_jobs=n_jobs, backend='loky', inner_max_num_threads=threads) as parallel:
+        if strategy == 'grid':
+            candidates = list(ParameterGrid(param_grid))
+            evaluated = evaluate_candidates(model, candidates, X, y, folds, budget, parallel, threads)
+
+        elif strategy == 'random':
+            candidates = list(ParameterGrid(param_grid))
+            rng.shuffle(candidates)
+            evaluated = evaluate_candidates(model, candidates, X, y, folds, budget, parallel, threads)
+
+        elif strategy == 'early_stopping':
+            grid = {k: v for k, v in param_grid.items() if k != 'n_estimators'}
+            candidates = list(ParameterGrid(grid))
+            rng.shuffle(candidates)
+            base = clone(model).set_params(n_estimators=EARLY_STOPPING_MAX_ESTIMATORS)
+            evaluated = evaluate_candidates(base, candidates, X, y, folds, budget, parallel, threads,
+                                            task=fit_early_stopping)
+            for result in evaluated:
+                result['params'] = {**result['params'], 'n_estimators': result.pop('rounds')}
+
+        else:
+            evaluated = _successive_halving(model, param_grid, X, y, folds, budget, parallel,
+                                            threads, rng)
+
+        if not evaluated:
+            raise RuntimeError("Search budget too small to evaluate a single candidate")
+        best = min(evaluated, key=lambda result: result['mse'])
+
+        best_model = limit_threads(clone(model).set_params(**best['params']), TRAINING_THREADS)
+        best_model.fit(X, y)
+        budget.fits += 1
+
+    return {
+        'model': best_model,
+        'best_params': best['params'],
+        'cv_rmse': float(np.sqrt(best['mse'])),
+        'strategy': strategy,
+        'fits': budget.fits,
+        'seconds': budget.elapsed,
+        'candidates': len(evaluated),
+        'budget_exhausted': budget.exhausted(),
+    }
+
+
+def _successive_halving(model, param_grid, X, y, folds, budget, parallel, threads, rng):
+    """
+    Evaluate all candidates cheaply, keep the best third, repeat with three times the resource.
+
+    The resource is n_estimators when it is part of the grid, otherwise the
+    number of training rows per fold. Returns the candidates of the last
+    round that was evaluated, so all compared scores used the same resource.
+    If the budget ran out before the full resource was reached, the best
+    candidate of that round is cross-validated again with the full resource
+    (like the final refit, these fits are not limited by the budget), so the
+    returned score belongs to the returned parameters.
+    """
+    grid = dict(param_grid)
+    max_estimators = max(grid.pop('n_estimators')) if 'n_estimators' in grid else None
+    candidates = list(ParameterGrid(grid))
+    rng.shuffle(candidates)
+
+    def round_resource(share):
+        if max_estimators is not None:
+            return {'n_estimators': max(1, int(max_estimators * share))}, folds
+        return {}, [(train_index[rng.permutation(len(train_index))[:max(CV_FOLDS, int(len(train_index) * share))]],
+                     test_index) for train_index, test_index in folds]
+
+    # Smallest number of halvings that leaves a single candidate
+    halvings = 0
+    while HALVING_FACTOR ** halvings < len(candidates):
+        halvings += 1
+
+    last_round = []
+    full_resource = False
+    for round_index in range(halvings + 1):
+        share = HALVING_FACTOR ** (round_index - halvings)
+        resource, round_folds = round_resource(share)
+
+        evaluated = evaluate_candidates(model, [{**c, **resource} for c in candidates],
+                                        X, y, round_folds, budget, parallel, threads)
+        if not evaluated:
+            break
+        last_round = evaluated
+        full_resource = round_index == halvings
+        if len(evaluated) < len(candidates) or len(candidates) == 1:
+            break  # budget ran out during this round, or a single candidate is left
+
+        keep = max(1, math.ceil(len(evaluated) / HALVING_FACTOR))
+        ranked = sorted(evaluated, key=lambda result: result['mse'])[:keep]
+        candidates = [{k: v for k, v in result['params'].items() if k not in resource} for result in ranked]
+
+    if last_round and not full_resource:
+        # Stopped before the full resource was reached; score the winner with it
+        resource, _ = round_resource(1)
+        winner = min(last_round, key=lambda result: result['mse'])
+        params = {**winner['params'], **resource}
+        extra = SearchBudget(seconds=0, max_fits=0)
+        last_round = evaluate_candidates(model, [params], X, y, folds, extra, parallel, threads)
+        budget.fits += extra.fits
+    return last_round
+
+
+def atomic_dump(value, path):
+    """joblib.dump to a temporary file next to `path`, then rename it into place."""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}-", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            dump(value, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _referenced_names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if inspect.iscode(const):
+            names |= _referenced_names(const)
+    return names
+
+
+def stage_source(method, owner):
+    """
+    Source of a pipeline stage plus every function, method and class of this
+    module it uses, directly or through other helpers (including functions
+    passed as default arguments, e.g. `evaluate_candidates(task=...)`).
+
+    Parameters:
+    -----------
+    method : function
+        The stage, as found on the `owner` class.
+    owner : type
+        Pipeline class; its other methods are resolved by name, but the class
+        (and its base classes) as a whole is never included.
+
+    Returns:
+    --------
+    str : the sources, ordered by qualified name
+    """
+    namespace = {**globals(), **dict(inspect.getmembers(owner, inspect.isfunction))}
+    sources = {}
+    pending = [method]
+    while pending:
+        obj = pending.pop()
+        if obj.__qualname__ in sources:
+            continue
+        # The stage itself may be defined elsewhere, e.g. in a subclass
+        if obj is not method and (
+            (inspect.isclass(obj) and issubclass(owner, obj))
+            or getattr(obj, '__module__', None) != __name__
+        ):
+            continue
+        sources[obj.__qualname__] = inspect.getsource(obj)
+        if inspect.isclass(obj):
+            functions = [value for value in vars(obj).values() if inspect.isfunction(value)]
+        else:
+            functions = [obj]
+        for function in functions:
+            pending.extend(value for value in function.__defaults__ or () if inspect.isfunction(value))
+            pending.extend(namespace[name] for name in _referenced_names(function.__code__)
+                           if inspect.isfunction(namespace.get(name)) or inspect.isclass(namespace.get(name)))
+    return '\n'.join(sources[name] for name in sorted(sources))
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StageCache:
+    """
+    On-disk checkpoints of pipeline stage outputs.
+
+    Each stage is stored under a key hashed from everything its output
+    depends on (the keys of the stages it consumes, its source code and that
+    of the helpers in this module it calls, see `stage_source`,
+    PIPELINE_VERSION and its parameters), so a stage is recomputed when one
+    of those changes. Changes to imported modules or libraries are not
+    detected; bump PIPELINE_VERSION for those. Files are written to a temporary name and
+    renamed, so a crash never leaves a truncated checkpoint behind.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, stage, *parts):
+        return joblib_hash((stage, PIPELINE_VERSION) + parts, hash_name='sha1')
+
+    def _path(self, stage, key):
+        return os.path.join(self.directory, f"{stage}-{key}.joblib")
+
+    def load(self, stage, key):
+        """Return (True, value) for a stored checkpoint, else (False, None)."""
+        path = self._path(stage, key)
+        if not os.path.exists(path):
+            return False, None
+        try:
+            return True, load(path)
+        except Exception as e:
+            print(f"Ignoring unreadable checkpoint {path}: {e}")
+            return False, None
+
+    def save(self, stage, key, value):
+        atomic_dump(value, self._path(stage, key))
+
 
 class ParkinsonsUPDRSPredictor:
     
     
-    def __init__(self, data_path):
-        """Initialize the predictor with dataset path."""
+    def __init__(self, data_path=DATA_PATH, search_strategy=SEARCH_STRATEGY,
+                 search_time_budget=SEARCH_TIME_BUDGET, search_max_fits=SEARCH_MAX_FITS,
+                 cache_dir=TRAINING_CACHE_DIR, output_dir=TRAINING_OUTPUT_DIR,
+                 figures=True, show_figures=True, learning_curve=True):
+        """
+        Initialize the predictor with dataset path.
+
+        `search_strategy`, `search_time_budget` (seconds) and `search_max_fits`
+        control the hyperparameter search of optimize_best_models; the budget
+        applies to each optimized model separately, 0 meaning unlimited.
+        `cache_dir` holds the stage checkpoints of run_complete_pipeline
+        (None or empty to always recompute).
+
+        Figures, result tables and the model bundle go to `output_dir`.
+        `figures` saves the PNG figures, `show_figures` also opens them in a
+        window, and `learning_curve` refits the Random Forest on growing
+        subsets for the learning-curve panel.
+        """
+        if search_strategy not in SEARCH_STRATEGIES:
+            raise ValueError(f"Unknown search strategy {search_strategy!r}, expected one of {SEARCH_STRATEGIES}")
+        if figures and plt is None:
+            raise ImportError("matplotlib and seaborn are required for figures; install them or disable figures")
         self.data_path = data_path
+        self.output_dir = output_dir
+        self.figures = figures
+        self.show_figures = figures and show_figures
+        self.learning_curve = figures and learning_curve
+        os.makedirs(output_dir, exist_ok=True)
+        self.search_strategy = search_strategy
+        self.search_time_budget = search_time_budget
+        self.search_max_fits = search_max_fits
         self.data = None
         self.X_train = None
         self.X_test = None
@@ -32,6 +510,19 @@ class ParkinsonsUPDRSPredictor:
         self.scaler = None
         self.models = {}
         self.results = {}
+        self.cache = StageCache(cache_dir) if cache_dir else None
+    
+    def output_path(self, filename):
+        """Path of an output file in the output directory."""
+        return os.path.join(self.output_dir, filename)
+    
+    def finish_figure(self, fig, filename):
+        """Save the current figure to the output directory, show it if enabled, and free it."""
+        plt.tight_layout()
+        plt.savefig(self.output_path(filename), dpi=FIGURE_DPI, bbox_inches='tight')
+        if self.show_figures:
+            plt.show()
+        plt.close(fig)
         
     def load_and_explore_data(self):
         """Load the dataset and perform exploratory data analysis."""
@@ -74,6 +565,10 @@ class ParkinsonsUPDRSPredictor:
         print("CREATING DATA VISUALIZATIONS")
         print("=" * 60)
         
+        if not self.figures:
+            print("Figures disabled, skipping data visualizations")
+            return
+        
         # Create figure with subplots
         fig = plt.figure(figsize=(20, 15))
         
@@ -178,10 +673,7 @@ class ParkinsonsUPDRSPredictor:
         plt.title('Distribution of Sample Voice Features')
         plt.legend()
         
-        plt.tight_layout()
-        plt.savefig('/Users/akilafernando/Documents/TensorForge_Model/data_exploration.png', 
-                   dpi=300, bbox_inches='tight')
-        plt.show()
+        self.finish_figure(fig, 'data_exploration.png')
         
         print("Data visualizations saved as 'data_exploration.png'")
     
@@ -242,8 +734,8 @@ class ParkinsonsUPDRSPredictor:
             score = selector.scores_[selector.get_support()][i-1]
             print(f"{i:2d}. {feature:<20} (Score: {score:.2f})")
         
-        # Method 2: Random Forest feature importance
-        rf = RandomForestRegressor(n_estimators=100, random_state=42)
+        # Method 2: Random Forest feature importance (trees built on every allowed thread)
+        rf = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=TRAINING_THREADS)
         rf.fit(self.X_train_scaled, self.y_train)
         
         feature_importance = pd.DataFrame({
@@ -256,17 +748,15 @@ class ParkinsonsUPDRSPredictor:
             print(f"{i:2d}. {row['feature']:<20} (Importance: {row['importance']:.4f})")
         
         # Visualize feature importance
-        plt.figure(figsize=(12, 8))
-        top_features = feature_importance.head(15)
-        plt.barh(range(len(top_features)), top_features['importance'])
-        plt.yticks(range(len(top_features)), top_features['feature'])
-        plt.xlabel('Feature Importance')
-        plt.title('Top 15 Feature Importance (Random Forest)')
-        plt.gca().invert_yaxis()
-        plt.tight_layout()
-        plt.savefig('/Users/akilafernando/Documents/TensorForge_Model/feature_importance.png', 
-                   dpi=300, bbox_inches='tight')
-        plt.show()
+        if self.figures:
+            fig = plt.figure(figsize=(12, 8))
+            top_features = feature_importance.head(15)
+            plt.barh(range(len(top_features)), top_features['importance'])
+            plt.yticks(range(len(top_features)), top_features['feature'])
+            plt.xlabel('Feature Importance')
+            plt.title('Top 15 Feature Importance (Random Forest)')
+            plt.gca().invert_yaxis()
+            self.finish_figure(fig, 'feature_importance.png')
         
         return selected_features, feature_importance
     
@@ -288,17 +778,34 @@ class ParkinsonsUPDRSPredictor:
             'LightGBM': lgb.LGBMRegressor(random_state=42, verbose=-1)
         }
         
-        # Train and evaluate each model
-        for name, model in models_to_train.items():
-            print(f"\nTraining {name}...")
-            
-            # Cross-validation
-            cv_scores = cross_val_score(model, self.X_train_scaled, self.y_train, 
-                                      cv=5, scoring='neg_mean_squared_error')
-            cv_rmse = np.sqrt(-cv_scores)
-            
-            # Fit model
-            model.fit(self.X_train_scaled, self.y_train)
+        # Every (model, CV fold) pair and every final fit is an independent
+        # task; they run concurrently on one memory-mapped copy of the data.
+        folds = list(KFold(n_splits=CV_FOLDS).split(self.X_train_scaled))
+        tasks = [(name, fold) for name in models_to_train for fold in folds + [(None, None)]]
+        n_jobs = max(1, min(TRAINING_JOBS, len(tasks)))
+        threads = threads_per_job(n_jobs)
+        print(f"Fitting {len(models_to_train)} models x ({CV_FOLDS} folds + final fit) "
+              f"on {n_jobs} processes, {threads} threads each")
+        
+        with shared_arrays(self.X_train_scaled, self.y_train.to_numpy()) as (X, y):
+            outputs = Parallel(n_jobs=n_jobs, backend='loky', inner_max_num_threads=threads)(
+                delayed(fit_candidate)(models_to_train[name], X, y, train_index, test_index, threads)
+                for name, (train_index, test_index) in tasks
+            )
+        
+        fold_mse = {name: [] for name in models_to_train}
+        fitted = {}
+        for (name, (train_index, _)), output in zip(tasks, outputs):
+            if train_index is None:
+                fitted[name] = output
+            else:
+                fold_mse[name].append(output)
+        
+        # Evaluate each model
+        for name in models_to_train:
+            print(f"\nResults for {name}...")
+            model = fitted[name]
+            cv_rmse = np.sqrt(fold_mse[name])
             
             # Predictions
             train_pred = model.predict(self.X_train_scaled)
@@ -388,16 +895,14 @@ class ParkinsonsUPDRSPredictor:
             else:
                 continue  # Skip models we don't have param grids for
             
-            # Grid search with cross-validation
-            grid_search = GridSearchCV(
-                model, param_grid, cv=5, scoring='neg_mean_squared_error',
-                n_jobs=-1, verbose=1
-            )
-            
-            grid_search.fit(self.X_train_scaled, self.y_train)
+            # Cross-validated search within the configured budget
+            budget = SearchBudget(self.search_time_budget, self.search_max_fits)
+            with shared_arrays(self.X_train_scaled, self.y_train.to_numpy()) as (X, y):
+                search = search_hyperparameters(model, param_grid, X, y,
+                                                self.search_strategy, budget)
             
             # Get best model
-            best_model = grid_search.best_estimator_
+            best_model = search.pop('model')
             
             # Evaluate optimized model
             train_pred = best_model.predict(self.X_train_scaled)
@@ -409,14 +914,18 @@ class ParkinsonsUPDRSPredictor:
             
             optimized_models[f"{name}_Optimized"] = {
                 'model': best_model,
-                'best_params': grid_search.best_params_,
+                'best_params': search['best_params'],
                 'test_rmse': test_rmse,
                 'test_mae': test_mae,
                 'test_r2': test_r2,
-                'predictions': test_pred
+                'predictions': test_pred,
+                'search': search
             }
             
-            print(f"Best parameters: {grid_search.best_params_}")
+            print(f"{search['strategy']} search: {search['candidates']} candidates, "
+                  f"{search['fits']} fits in {search['seconds']:.1f}s"
+                  f"{' (budget exhausted)' if search['budget_exhausted'] else ''}")
+            print(f"Best parameters: {search['best_params']} (CV RMSE {search['cv_rmse']:.3f})")
             print(f"Optimized Test RMSE: {test_rmse:.3f}")
             print(f"Improvement: {self.results[name]['test_rmse'] - test_rmse:.3f}")
         
@@ -500,9 +1009,29 @@ class ParkinsonsUPDRSPredictor:
         print(results_df.round(4))
         
         # Save results
-        results_df.to_csv('/Users/akilafernando/Documents/TensorForge_Model/model_results.csv')
+        results_df.to_csv(self.output_path('model_results.csv'))
+        
+        best_model_name = results_df.index[0]
         
         # Create comprehensive visualizations
+        if self.figures:
+            self.plot_evaluation(results_df, all_results, best_model_name, ensemble_pred)
+        
+        # Print final summary
+        print(f"\n BEST MODEL: {best_model_name}")
+        print(f"   Test RMSE: {results_df.loc[best_model_name, 'RMSE']:.3f}")
+        print(f"   Test MAE:  {results_df.loc[best_model_name, 'MAE']:.3f}")
+        print(f"   Test R²:   {results_df.loc[best_model_name, 'R²']:.3f}")
+        
+        print(f"\n ENSEMBLE MODEL:")
+        print(f"   Test RMSE: {ensemble_rmse:.3f}")
+        print(f"   Test MAE:  {ensemble_mae:.3f}")
+        print(f"   Test R²:   {ensemble_r2:.3f}")
+        
+        return results_df, best_model_name
+    
+    def plot_evaluation(self, results_df, all_results, best_model_name, ensemble_pred):
+        """Plot the model comparison, best-model diagnostics and learning curve."""
         fig = plt.figure(figsize=(20, 12))
         
         # 1. Model comparison bar plot
@@ -514,7 +1043,6 @@ class ParkinsonsUPDRSPredictor:
         plt.title('Model Performance Comparison')
         
         # 2. Predicted vs Actual for best model
-        best_model_name = results_df.index[0]
         best_predictions = all_results[best_model_name]['predictions']
         
         plt.subplot(2, 4, 2)
@@ -588,7 +1116,7 @@ class ParkinsonsUPDRSPredictor:
         
         # 8. Learning curve (if available)
         plt.subplot(2, 4, 8)
-        if hasattr(self.models.get('Random Forest', None), 'estimators_'):
+        if self.learning_curve and hasattr(self.models.get('Random Forest', None), 'estimators_'):
             # Simulate learning curve for Random Forest
             train_sizes = [0.1, 0.3, 0.5, 0.7, 0.9, 1.0]
             train_errors = []
@@ -617,34 +1145,26 @@ class ParkinsonsUPDRSPredictor:
             plt.title('Learning Curve')
             plt.legend()
         
-        plt.tight_layout()
-        plt.savefig('/Users/akilafernando/Documents/TensorForge_Model/model_evaluation.png', 
-                   dpi=300, bbox_inches='tight')
-        plt.show()
-        
-        # Print final summary
-        print(f"\n BEST MODEL: {best_model_name}")
-        print(f"   Test RMSE: {results_df.loc[best_model_name, 'RMSE']:.3f}")
-        print(f"   Test MAE:  {results_df.loc[best_model_name, 'MAE']:.3f}")
-        print(f"   Test R²:   {results_df.loc[best_model_name, 'R²']:.3f}")
-        
-        print(f"\n ENSEMBLE MODEL:")
-        print(f"   Test RMSE: {ensemble_rmse:.3f}")
-        print(f"   Test MAE:  {ensemble_mae:.3f}")
-        print(f"   Test R²:   {ensemble_r2:.3f}")
-        
-        return results_df, best_model_name
+        self.finish_figure(fig, 'model_evaluation.png')
     
     def save_best_model(self, optimized_models, ensemble, best_model_name):
-        """Save the best performing model for future use."""
-        import joblib
-        
+        """
+        Save the best performing model for future use.
+
+        scaler.pkl, ensemble_model.pkl and feature_names.pkl in the output
+        directory form the bundle model_predictor serves (see MODEL_DIR),
+        model_bundle/ the same model in the memory-mappable format it
+        prefers; model_info.json records how it was trained. Every file is
+        written to a temporary name and renamed, so a running API never
+        loads a half-written artifact, and `model_version` is written after
+        the pickles, so it never combines pickles of two runs.
+        """
         print("\n" + "=" * 60)
         print("SAVING BEST MODEL")
         print("=" * 60)
         
         # Save the scaler
-        joblib.dump(self.scaler, '/Users/akilafernando/Documents/TensorForge_Model/scaler.pkl')
+        atomic_dump(self.scaler, self.output_path('scaler.pkl'))
         
         # Save the best individual model
         if best_model_name in optimized_models:
@@ -655,20 +1175,47 @@ class ParkinsonsUPDRSPredictor:
             # If best model is ensemble, save the first optimized model
             best_model = list(optimized_models.values())[0]['model']
         
-        joblib.dump(best_model, '/Users/akilafernando/Documents/TensorForge_Model/best_model.pkl')
+        atomic_dump(best_model, self.output_path('best_model.pkl'))
         
         # Save the ensemble model
-        joblib.dump(ensemble, '/Users/akilafernando/Documents/TensorForge_Model/ensemble_model.pkl')
+        atomic_dump(ensemble, self.output_path('ensemble_model.pkl'))
         
         # Save feature names
         feature_names = list(self.X_train.columns)
-        joblib.dump(feature_names, '/Users/akilafernando/Documents/TensorForge_Model/feature_names.pkl')
+        atomic_dump(feature_names, self.output_path('feature_names.pkl'))
+        
+        # Version stamp of the three pickles above; written last
+        write_model_version([self.output_path(name) for name in
+                             ('scaler.pkl', 'ensemble_model.pkl', 'feature_names.pkl')],
+                            self.output_path(MODEL_VERSION_NAME))
+        
+        # Describe the bundle
+        model_info = {
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'data': os.path.abspath(self.data_path),
+            'data_sha256': file_digest(self.data_path),
+            'best_model': best_model_name,
+            'ensemble_members': list(optimized_models),
+            'feature_names': feature_names,
+            'search_strategy': self.search_strategy,
+            'versions': {'scikit-learn': sklearn.__version__, 'xgboost': xgb.__version__,
+                         'lightgbm': lgb.__version__, 'numpy': np.__version__},
+        }
+        with open(self.output_path('model_info.json'), 'w') as f:
+            json.dump(model_info, f, indent=2)
         
-        print(f"Saved models and preprocessing objects:")
+        # Memory-mappable copy of scaler, ensemble and feature names
+        manifest = write_bundle(self.output_path('model_bundle'), self.scaler, ensemble, feature_names,
+                                sample=self.X_test.to_numpy(dtype=np.float64), metadata=model_info)
+        
+        print(f"Saved models and preprocessing objects to {self.output_dir}:")
         print(f"   - Best model ({best_model_name}): best_model.pkl")
         print(f"   - Ensemble model: ensemble_model.pkl")
         print(f"   - Feature scaler: scaler.pkl")
         print(f"   - Feature names: feature_names.pkl")
+        print(f"   - Version stamp: {MODEL_VERSION_NAME}")
+        print(f"   - Bundle description: model_info.json")
+        print(f"   - Memory-mappable bundle: model_bundle/ (version {manifest['checksum'][:12]})")
         
         # Create a prediction function for easy use
         prediction_code = '''
@@ -711,43 +1258,107 @@ def predict_motor_updrs(features_dict):
 # })
 '''
         
-        with open('/Users/akilafernando/Documents/TensorForge_Model/predict_updrs.py', 'w') as f:
+        with open(self.output_path('predict_updrs.py'), 'w') as f:
             f.write(prediction_code)
         
         print(f"   - Prediction function: predict_updrs.py")
     
+    def run_stage(self, name, method, *args, depends=(), params=None, state=()):
+        """
+        Run one pipeline stage, or restore its result from a checkpoint.
+
+        Parameters:
+        -----------
+        name : str
+            Stage name, used for the checkpoint file.
+        method : callable
+            Bound method implementing the stage, called with `args`.
+        depends : tuple of str
+            Checkpoint keys of the stages whose outputs this one consumes.
+        params : dict, optional
+            Settings that change the stage's output.
+        state : tuple of str
+            Attributes of `self` the stage sets; they are checkpointed with
+            its return value and restored on a hit.
+
+        Returns:
+        --------
+        tuple : (return value of the stage, checkpoint key of this stage)
+        """
+        key = None
+        if self.cache is not None:
+            source = stage_source(getattr(type(self), method.__name__), type(self))
+            key = self.cache.key(name, source, tuple(depends), sorted((params or {}).items()))
+            hit, checkpoint = self.cache.load(name, key)
+            if hit:
+                print(f"\n[{name}] unchanged, restored from checkpoint {key[:12]}")
+                for attr, value in checkpoint['state'].items():
+                    setattr(self, attr, value)
+                return checkpoint['result'], key
+
+        start = time.perf_counter()
+        result = method(*args)
+        if self.cache is not None:
+            self.cache.save(name, key, {
+                'result': result,
+                'state': {attr: getattr(self, attr) for attr in state},
+            })
+            print(f"[{name}] finished in {time.perf_counter() - start:.1f}s, checkpoint saved")
+        return result, key
+    
     def run_complete_pipeline(self):
-        """Run the complete machine learning pipeline."""
+        """
+        Run the complete machine learning pipeline.
+
+        With a checkpoint directory, every stage's output is stored as soon
+        as it finishes. A rerun skips the stages whose inputs, code and
+        parameters are unchanged, and a crashed run resumes from the last
+        completed stage.
+        """
         print("🚀 STARTING PARKINSON'S DISEASE UPDRS PREDICTION PIPELINE")
         print("=" * 80)
         
+        data_hash = file_digest(self.data_path) if self.cache is not None else None
+        
         # Step 1: Load and explore data
-        self.load_and_explore_data()
+        _, load_key = self.run_stage('load', self.load_and_explore_data,
+                                     params={'data': data_hash}, state=('data',))
+        
+        figure_params = {'figures': self.figures, 'output_dir': os.path.abspath(self.output_dir)}
         
         # Step 2: Visualize data
-        self.visualize_data()
+        self.run_stage('visualize', self.visualize_data, depends=(load_key,), params=figure_params)
         
         # Step 3: Prepare features
-        self.prepare_features()
+        _, prepare_key = self.run_stage(
+            'prepare', self.prepare_features, depends=(load_key,),
+            state=('X_train', 'X_test', 'y_train', 'y_test', 'scaler', 'X_train_scaled', 'X_test_scaled'))
         
         # Step 4: Feature selection
-        selected_features, feature_importance = self.feature_selection()
+        (selected_features, feature_importance), _ = self.run_stage(
+            'feature_selection', self.feature_selection, depends=(prepare_key,), params=figure_params)
         
         # Step 5: Train models
-        self.train_models()
+        _, train_key = self.run_stage('train', self.train_models, depends=(prepare_key,),
+                                      params={'cv_folds': CV_FOLDS}, state=('models', 'results'))
         
         # Step 6: Optimize best models
-        optimized_models = self.optimize_best_models()
+        optimized_models, optimize_key = self.run_stage(
+            'optimize', self.optimize_best_models, depends=(train_key,),
+            params={'cv_folds': CV_FOLDS, 'strategy': self.search_strategy,
+                    'time_budget': self.search_time_budget, 'max_fits': self.search_max_fits})
         
         # Step 7: Create ensemble
-        ensemble, ensemble_pred = self.create_ensemble_model(optimized_models)
+        (ensemble, ensemble_pred), ensemble_key = self.run_stage(
+            'ensemble', self.create_ensemble_model, optimized_models, depends=(optimize_key,))
         
         # Step 8: Evaluate and visualize
-        results_df, best_model_name = self.evaluate_and_visualize_results(
-            optimized_models, ensemble, ensemble_pred
-        )
+        (results_df, best_model_name), _ = self.run_stage(
+            'evaluate', self.evaluate_and_visualize_results, optimized_models, ensemble, ensemble_pred,
+            depends=(train_key, optimize_key, ensemble_key),
+            params={**figure_params, 'learning_curve': self.learning_curve})
         
-        # Step 9: Save best model
+        # Step 9: Save best model (always written, so the artifacts match this run)
         self.save_best_model(optimized_models, ensemble, best_model_name)
         
         print("\n" + "=" * 80)
@@ -756,10 +1367,47 @@ def predict_motor_updrs(features_dict):
         
         return results_df, best_model_name, optimized_models, ensemble
 
-def main():
-    """Main function to run the complete pipeline."""
+def main(argv=None):
+    """
+    Command-line entry point: train, evaluate and write the model bundle.
+
+    Run from the backend directory, e.g. on a build machine:
+
+        python -m app.ml.Model_training --headless --output-dir build/model
+    """
+    parser = argparse.ArgumentParser(description="Train the motor UPDRS prediction models.")
+    parser.add_argument('--data', default=DATA_PATH, help='training CSV (parkinsons_updrs.csv)')
+    parser.add_argument('--output-dir', default=TRAINING_OUTPUT_DIR,
+                        help='directory for the model bundle, result table and figures')
+    parser.add_argument('--headless', action='store_true',
+                        help='no figure windows, figures and learning-curve refits skipped')
+    parser.add_argument('--figures', action='store_true',
+                        help='with --headless, still save the PNG figures (rendered off-screen)')
+    parser.add_argument('--cache-dir', default=TRAINING_CACHE_DIR,
+                        help='stage checkpoint directory (empty string disables checkpoints)')
+    parser.add_argument('--search-strategy', choices=SEARCH_STRATEGIES, default=SEARCH_STRATEGY)
+    parser.add_argument('--search-time-budget', type=float, default=SEARCH_TIME_BUDGET,
+                        help='seconds per model search, 0 for unlimited')
+    parser.add_argument('--search-max-fits', type=int, default=SEARCH_MAX_FITS,
+                        help='fits per model search, 0 for unlimited')
+    args = parser.parse_args(argv)
+    
+    figures = not args.headless or args.figures
+    if args.headless and plt is not None:
+        plt.switch_backend('Agg')  # render off-screen, never open a window
+    
     # Initialize the predictor
-    predictor = ParkinsonsUPDRSPredictor('/Users/akilafernando/Documents/TensorForge_Model/parkinsons_updrs.csv')
+    predictor = ParkinsonsUPDRSPredictor(
+        args.data,
+        search_strategy=args.search_strategy,
+        search_time_budget=args.search_time_budget,
+        search_max_fits=args.search_max_fits,
+        cache_dir=args.cache_dir,
+        output_dir=args.output_dir,
+        figures=figures,
+        show_figures=not args.headless,
+        learning_curve=not args.headless,
+    )
     
     # Run the complete pipeline
     results, best_model, optimized_models, ensemble = predictor.run_complete_pipeline()
@@ -767,4 +1415,4 @@ def main():
     return predictor, results, best_model, optimized_models, ensemble
 
 if __name__ == "__main__":
-    predictor, results, best_model, optimized_models, ensemble = main()
\ No newline at end of file
+    main()
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+from sklearn import config_context
+
+# Largest absolute difference to the sklearn path accepted by the self-check
+ENGINE_TOLERANCE = 1e-6
+
+
+class CompiledEnsemble:
+    """
+    Low-overhead inference path built from the saved scaler and ensemble.
+
+    The scaler is reduced to `center` / `scale` arrays and each ensemble
+    member to a function calling its native predict (XGBoost booster,
+    LightGBM booster, sklearn tree arrays) on a contiguous float matrix whose
+    columns follow `feature_names`. This skips pandas, sklearn input
+    validation and the VotingRegressor dispatch on every call.
+
+    Use `compile_ensemble` to build one; it checks the result against the
+    sklearn path before returning.
+    """
+
+    def __init__(self, feature_names, center, scale, members, weights=None):
+        self.feature_names = list(feature_names)
+        self.center = center
+        self.scale = scale
+        self.members = members
+        self.weights = None if weights is None else np.asarray(weights, dtype=np.float64)
+
+    def predict(self, X):
+        """Predict from raw (unscaled) features of shape (n_samples, n_features)."""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.center is not None:
+            X = X - self.center
+        if self.scale is not None:
+            X = X / self.scale
+        X = np.ascontiguousarray(X)
+
+        predictions = np.column_stack([member(X) for member in self.members])
+        return np.average(predictions, axis=1, weights=self.weights)
+
+    def predict_one(self, values):
+        """Predict a single row given as a sequence in `feature_names` order."""
+        return float(self.predict(np.asarray(values, dtype=np.float64)[None, :])[0])
+
+
+def compile_ensemble(scaler, model, feature_names):
+    """
+    Build a CompiledEnsemble from the training artifacts.
+
+    Returns None when the scaler is not supported or the compiled path does
+    not reproduce `model.predict(scaler.transform(X))` within
+    ENGINE_TOLERANCE, in which case callers keep using sklearn.
+    """
+    try:
+        center, scale = _compile_scaler(scaler)
+        members, weights = _compile_members(model)
+        engine = CompiledEnsemble(feature_names, center, scale, members, weights)
+    except (TypeError, AttributeError) as e:
+        print(f"Compiled inference unavailable, using sklearn path: {e}")
+        return None
+
+    # Self-check on rows around the scaler's center
+    n_features = len(feature_names)
+    reference = center if center is not None else np.zeros(n_features)
+    spread = scale if scale is not None else np.ones(n_features)
+    rng = np.random.default_rng(0)
+    probe = reference + spread * rng.standard_normal((16, n_features))
+
+    expected = model.predict(scaler.transform(pd.DataFrame(probe, columns=list(feature_names))))
+    difference = np.max(np.abs(engine.predict(probe) - expected))
+    if not difference <= ENGINE_TOLERANCE:
+        print(f"Compiled inference differs from sklearn by {difference:.3g}, using sklearn path")
+        return None
+    return engine
+
+
+def _compile_scaler(scaler):
+    name = type(scaler).__name__
+    if name == 'RobustScaler':
+        center = scaler.center_ if scaler.with_centering else None
+        scale = scaler.scale_ if scaler.with_scaling else None
+    elif name == 'StandardScaler':
+        center = scaler.mean_ if scaler.with_mean else None
+        scale = scaler.scale_ if scaler.with_std else None
+    else:
+        raise TypeError(f"unsupported scaler {name}")
+
+    def as_array(values):
+        return None if values is None else np.ascontiguousarray(values, dtype=np.float64)
+
+    return as_array(center), as_array(scale)
+
+
+def _compile_members(model):
+    if type(model).__name__ == 'VotingRegressor':
+        weights = None
+        if model.weights is not None:
+            weights = [w for (_, est), w in zip(model.estimators, model.weights) if est != 'drop']
+        return [_compile_member(est) for est in model.estimators_], weights
+    return [_compile_member(model)], None
+
+
+def _compile_member(estimator):
+    name = type(estimator).__name__
+
+    if name == 'XGBRegressor':
+        booster = estimator.get_booster()
+        try:
+            iteration_range = (0, estimator.best_iteration + 1)
+        except AttributeError:
+            iteration_range = (0, 0)
+
+        def predict_xgboost(X):
+            return booster.inplace_predict(X, iteration_range=iteration_range,
+                                           validate_features=False)
+        return predict_xgboost
+
+    if name == 'LGBMRegressor':
+        booster = estimator.booster_
+
+        def predict_lightgbm(X):
+            return booster.predict(X, num_iteration=None, validate_features=False)
+        return predict_lightgbm
+
+    if name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        trees = [tree.tree_ for tree in estimator.estimators_]
+
+        def predict_forest(X):
+            X32 = np.ascontiguousarray(X, dtype=np.float32)
+            total = np.zeros(len(X32), dtype=np.float64)
+            for tree in trees:
+                total += tree.predict(X32).reshape(len(X32), -1)[:, 0]
+            return total / len(trees)
+        return predict_forest
+
+    # Anything else: the estimator's own predict, without finiteness checks
+    def predict_estimator(X):
+        with config_context(assume_finite=True):
+            return estimator.predict(X)
+    return predict_estimator
@@ -0,0 +1,461 @@
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from app.ml.inference_engine import CompiledEnsemble, _compile_scaler
+
+BUNDLE_FORMAT = 'parkinsons-updrs-model-bundle'
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+# Largest absolute difference to the sklearn objects accepted when a bundle
+# is written. Tree ensembles are summed in float64 here while XGBoost sums in
+# float32, so this is looser than the in-process engine's tolerance.
+BUNDLE_TOLERANCE = 1e-4
+
+# LightGBM treats values this close to zero as zero ('Zero' missing type)
+_LIGHTGBM_ZERO = 1e-35
+
+# Per-node arrays of a tree member, all trees of the member concatenated
+_TREE_ARRAYS = ('roots', 'feature', 'threshold', 'left', 'right', 'value', 'missing_left', 'zero_missing')
+
+
+class TreeMember:
+    """
+    Vectorized evaluator for a tree ensemble stored as flat node tables.
+
+    All trees advance one level per iteration for all rows at once, so the
+    Python loop runs as many times as the deepest tree is deep. Internal
+    nodes send a row left when `x <= threshold` (`x < threshold` with
+    decision 'lt'); NaN, and zero where `zero_missing` is set, follow
+    `missing_left`. Leaves have `left == -1` and carry `value`.
+
+    prediction = base + scale * (sum of the leaf values reached)
+    """
+
+    def __init__(self, arrays, decision='le', float32=False, base=0.0, scale=1.0):
+        for name in _TREE_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.strict = decision == 'lt'
+        self.float32 = float32
+        self.base = base
+        self.scale = scale
+        self.has_zero_missing = bool(np.any(self.zero_missing))
+
+    def __call__(self, X):
+        if self.float32:
+            # sklearn and XGBoost compare float32 features against their thresholds
+            X = X.astype(np.float32).astype(np.float64)
+        node = np.tile(np.asarray(self.roots, dtype=np.int64), (len(X), 1))
+        active = self.left[node] >= 0
+        while active.any():
+            rows, _ = np.nonzero(active)
+            current = node[active]
+            x = X[rows, self.feature[current]]
+            threshold = self.threshold[current]
+            go_left = x < threshold if self.strict else x <= threshold
+            missing = np.isnan(x)
+            if self.has_zero_missing:
+                missing |= self.zero_missing[current] & (np.abs(x) <= _LIGHTGBM_ZERO)
+            go_left = np.where(missing, self.missing_left[current], go_left)
+            node[active] = np.where(go_left, self.left[current], self.right[current])
+            active = self.left[node] >= 0
+        return self.base + self.scale * self.value[node].sum(axis=1)
+
+
+class LinearMember:
+    """Linear model: prediction = X @ coef + intercept."""
+
+    def __init__(self, coef, intercept):
+        self.coef = coef
+        self.intercept = intercept
+
+    def __call__(self, X):
+        return X @ self.coef + self.intercept
+
+
+def write_bundle(directory, scaler, model, feature_names, sample=None, metadata=None):
+    """
+    Write the scaler, ensemble and feature names as a memory-mappable bundle.
+
+    Scaler parameters and the node tables of tree ensembles (sklearn
+    forests and gradient boosting, XGBoost, LightGBM) and linear models are
+    stored as .npy files that `load_bundle` maps read-only, so worker
+    processes share them through the page cache instead of each holding an
+    unpickled copy. Members that cannot be converted, or whose converted
+    predictions differ from the original, are stored with joblib instead.
+
+    Array files are named after their content and manifest.json is
+    replaced last, so processes that are loading the previous bundle never
+    see a mix of old and new files.
+
+    Parameters:
+    -----------
+    directory : str
+        Bundle directory; created if needed.
+    scaler, model, feature_names
+        The artifacts model_predictor serves.
+    sample : array-like, optional
+        Raw feature rows used, with random rows, to check the bundle
+        against `model.predict(scaler.transform(sample))`.
+    metadata : dict, optional
+        Stored as-is in the manifest (e.g. training data hash).
+
+    Returns:
+    --------
+    dict : the manifest
+    """
+    feature_names = list(feature_names)
+    os.makedirs(directory, exist_ok=True)
+    center, scale = _compile_scaler(scaler)
+    probe = _probe_rows(center, scale, len(feature_names), sample)
+    scaled_probe = scaler.transform(pd.DataFrame(probe, columns=feature_names))
+
+    files = {}
+
+    def save_array(name, values):
+        filename = _write_content_addressed(directory, name, '.npy',
+                                            lambda f: np.save(f, np.ascontiguousarray(values)))
+        files[filename] = _file_sha256(os.path.join(directory, filename))
+        return filename
+
+    estimators, weights = _ensemble_members(model)
+    members = []
+    for name, estimator in estimators:
+        member = None
+        prefix = re.sub(r'[^A-Za-z0-9]+', '_', name)
+        try:
+            spec, arrays = _convert_member(estimator)
+            evaluator = _build_member(spec, arrays)
+            difference = np.max(np.abs(evaluator(scaled_probe) - estimator.predict(scaled_probe)))
+            if difference <= BUNDLE_TOLERANCE:
+                spec['arrays'] = {key: save_array(f"{prefix}_{key}", value) for key, value in arrays.items()}
+                member = spec
+            else:
+                print(f"Bundle member {name} differs from {type(estimator).__name__} by {difference:.3g}, pickling it")
+        except TypeError as e:
+            print(f"Bundle member {name} stored with joblib: {e}")
+        if member is None:
+            filename = _write_content_addressed(directory, prefix, '.joblib', lambda f: joblib.dump(estimator, f))
+            files[filename] = _file_sha256(os.path.join(directory, filename))
+            member = {'kind': 'pickle', 'file': filename}
+        member['name'] = name
+        member['estimator'] = type(estimator).__name__
+        members.append(member)
+
+    manifest = {
+        'format': BUNDLE_FORMAT,
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'feature_names': feature_names,
+        'scaler': {
+            'type': type(scaler).__name__,
+            'center': None if center is None else save_array('scaler_center', center),
+            'scale': None if scale is None else save_array('scaler_scale', scale),
+        },
+        'weights': weights,
+        'members': members,
+        'files': dict(sorted(files.items())),
+        'metadata': metadata or {},
+    }
+    manifest['checksum'] = _manifest_checksum(manifest)
+
+    # The whole bundle must reproduce the model before it is published
+    engine = _engine_from_manifest(directory, manifest)
+    expected = model.predict(scaled_probe)
+    difference = np.max(np.abs(engine.predict(probe) - expected))
+    if not difference <= BUNDLE_TOLERANCE:
+        raise ValueError(f"Model bundle differs from the model by {difference:.3g}")
+
+    _write_content_addressed(directory, MANIFEST_NAME, None,
+                             lambda f: f.write(json.dumps(manifest, indent=2).encode()))
+    _remove_unreferenced(directory, manifest)
+    return manifest
+
+
+def read_manifest(directory):
+    """Parse manifest.json of a bundle, checking the format and version."""
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != BUNDLE_FORMAT:
+        raise ValueError(f"{directory} is not a model bundle")
+    if manifest.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported model bundle version {manifest.get('format_version')}, "
+                         f"expected {BUNDLE_FORMAT_VERSION}")
+    return manifest
+
+
+def load_bundle(directory, verify=True):
+    """
+    Load a bundle written by `write_bundle` as a CompiledEnsemble.
+
+    Arrays are memory-mapped read-only; nothing is copied into the process
+    until it is touched. With `verify`, every file is checked against the
+    SHA-256 in the manifest first.
+
+    Returns:
+    --------
+    tuple : (CompiledEnsemble, manifest)
+    """
+    manifest = read_manifest(directory)
+    if manifest.get('checksum') != _manifest_checksum(manifest):
+        raise ValueError(f"Model bundle manifest in {directory} is corrupt")
+    if verify:
+        for filename, digest in manifest['files'].items():
+            if _file_sha256(os.path.join(directory, filename)) != digest:
+                raise ValueError(f"Model bundle file {filename} does not match its checksum")
+    return _engine_from_manifest(directory, manifest), manifest
+
+
+def _engine_from_manifest(directory, manifest):
+    def array(filename):
+        return None if filename is None else np.load(os.path.join(directory, filename), mmap_mode='r')
+
+    members = []
+    for spec in manifest['members']:
+        if spec['kind'] == 'pickle':
+            estimator = joblib.load(os.path.join(directory, spec['file']), mmap_mode='r')
+            members.append(_estimator_predict(estimator))
+        else:
+            members.append(_build_member(spec, {key: array(name) for key, name in spec['arrays'].items()}))
+
+    scaler = manifest['scaler']
+    return CompiledEnsemble(manifest['feature_names'], array(scaler['center']), array(scaler['scale']),
+                            members, manifest['weights'])
+
+
+def _build_member(spec, arrays):
+    if spec['kind'] == 'trees':
+        return TreeMember(arrays, spec['decision'], spec['float32'], spec['base'], spec['scale'])
+    if spec['kind'] == 'linear':
+        return LinearMember(arrays['coef'], spec['intercept'])
+    raise ValueError(f"Unknown bundle member kind {spec['kind']!r}")
+
+
+def _estimator_predict(estimator):
+    def predict_estimator(X):
+        return estimator.predict(X)
+    return predict_estimator
+
+
+def _ensemble_members(model):
+    if type(model).__name__ == 'VotingRegressor':
+        weights = None
+        if model.weights is not None:
+            weights = [float(w) for (_, est), w in zip(model.estimators, model.weights) if est != 'drop']
+        names = [name for name, est in model.estimators if est != 'drop']
+        return list(zip(names, model.estimators_)), weights
+    return [('model', model)], None
+
+
+def _convert_member(estimator):
+    """Return (spec, arrays) for a supported estimator; TypeError otherwise."""
+    name = type(estimator).__name__
+    if name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        trees = [_sklearn_tree(tree.tree_) for tree in estimator.estimators_]
+        return _tree_spec(float32=True, scale=1.0 / len(trees)), _concatenate_trees(trees)
+    if name == 'DecisionTreeRegressor':
+        return _tree_spec(float32=True), _concatenate_trees([_sklearn_tree(estimator.tree_)])
+    if name == 'GradientBoostingRegressor':
+        return _convert_gradient_boosting(estimator)
+    if name == 'XGBRegressor':
+        return _convert_xgboost(estimator)
+    if name == 'LGBMRegressor':
+        return _convert_lightgbm(estimator)
+    if name in ('Ridge', 'Lasso', 'ElasticNet', 'LinearRegression'):
+        coef = np.asarray(estimator.coef_, dtype=np.float64)
+        if coef.ndim != 1:
+            raise TypeError(f"multi-output {name} is not supported")
+        return {'kind': 'linear', 'intercept': float(estimator.intercept_)}, {'coef': coef}
+    raise TypeError(f"no array form for {name}")
+
+
+def _tree_spec(decision='le', float32=False, base=0.0, scale=1.0):
+    return {'kind': 'trees', 'decision': decision, 'float32': float32, 'base': float(base), 'scale': float(scale)}
+
+
+def _sklearn_tree(tree):
+    if tree.n_outputs != 1:
+        raise TypeError("multi-output trees are not supported")
+    left = tree.children_left.astype(np.int32)
+    missing_left = getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8))
+    return {
+        'feature': np.where(left >= 0, tree.feature, 0).astype(np.int32),
+        'threshold': tree.threshold.astype(np.float64),
+        'left': left,
+        'right': tree.children_right.astype(np.int32),
+        'value': tree.value[:, 0, 0].astype(np.float64),
+        'missing_left': np.asarray(missing_left, dtype=bool),
+        'zero_missing': np.zeros(tree.node_count, dtype=bool),
+    }
+
+
+def _convert_gradient_boosting(estimator):
+    init = estimator.init_
+    if init == 'zero':
+        base = 0.0
+    elif type(init).__name__ == 'DummyRegressor':
+        base = float(np.ravel(init.constant_)[0])
+    else:
+        raise TypeError(f"GradientBoostingRegressor with init {type(init).__name__} is not supported")
+    trees = [_sklearn_tree(stage[0].tree_) for stage in estimator.estimators_]
+    return _tree_spec(float32=True, base=base, scale=estimator.learning_rate), _concatenate_trees(trees)
+
+
+def _convert_xgboost(estimator):
+    learner = json.loads(estimator.get_booster().save_raw('json'))['learner']
+    objective = learner['objective']['name']
+    if objective not in ('reg:squarederror', 'reg:absoluteerror', 'reg:pseudohubererror'):
+        raise TypeError(f"XGBoost objective {objective} is not supported")
+    booster = learner['gradient_booster']
+    if booster['name'] != 'gbtree':
+        raise TypeError(f"XGBoost booster {booster['name']} is not supported")
+    params = learner['learner_model_param']
+    if int(params.get('num_target', '1')) != 1:
+        raise TypeError("multi-target XGBoost models are not supported")
+
+    trees = booster['model']['trees']
+    try:
+        # Same trees as predict() after early stopping
+        indptr = booster['model']['iteration_indptr']
+        trees = trees[:indptr[estimator.best_iteration + 1]]
+    except AttributeError:
+        pass
+
+    converted = []
+    for tree in trees:
+        if any(tree['split_type']):
+            raise TypeError("categorical XGBoost splits are not supported")
+        left = np.asarray(tree['left_children'], dtype=np.int32)
+        leaf = left < 0
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32).astype(np.float64)
+        converted.append({
+            'feature': np.where(leaf, 0, tree['split_indices']).astype(np.int32),
+            'threshold': np.where(leaf, 0.0, conditions),
+            'left': left,
+            'right': np.asarray(tree['right_children'], dtype=np.int32),
+            'value': np.where(leaf, conditions, 0.0),  # leaves keep their weight in split_conditions
+            'missing_left': np.asarray(tree['default_left'], dtype=bool),
+            'zero_missing': np.zeros(len(left), dtype=bool),
+        })
+    base = float(params['base_score'].strip('[]'))
+    return _tree_spec(decision='lt', float32=True, base=base), _concatenate_trees(converted)
+
+
+def _convert_lightgbm(estimator):
+    dump = estimator.booster_.dump_model()
+    objective = dump['objective'].split()[0]
+    if objective not in ('regression', 'regression_l1', 'huber', 'fair', 'quantile'):
+        raise TypeError(f"LightGBM objective {objective} is not supported")
+    if dump['num_tree_per_iteration'] != 1:
+        raise TypeError("multi-output LightGBM models are not supported")
+
+    trees = [_lightgbm_tree(info['tree_structure']) for info in dump['tree_info']]
+    scale = 1.0 / len(trees) if dump.get('average_output') else 1.0
+    return _tree_spec(scale=scale), _concatenate_trees(trees)
+
+
+def _lightgbm_tree(root):
+    nodes = []
+
+    def visit(node):
+        index = len(nodes)
+        nodes.append(None)
+        if 'leaf_value' in node:
+            nodes[index] = (0, 0.0, -1, -1, float(node['leaf_value']), False, False)
+            return index
+        if node['decision_type'] != '<=':
+            raise TypeError(f"LightGBM decision type {node['decision_type']} is not supported")
+        left = visit(node['left_child'])
+        right = visit(node['right_child'])
+        threshold = float(node['threshold'])
+        missing_type = node['missing_type']
+        if missing_type == 'None':
+            # NaN is compared as 0.0
+            missing_left, zero_missing = 0.0 <= threshold, False
+        else:
+            missing_left, zero_missing = bool(node['default_left']), missing_type == 'Zero'
+        nodes[index] = (node['split_feature'], threshold, left, right, 0.0, missing_left, zero_missing)
+        return index
+
+    visit(root)
+    feature, threshold, left, right, value, missing_left, zero_missing = zip(*nodes)
+    return {
+        'feature': np.asarray(feature, dtype=np.int32),
+        'threshold': np.asarray(threshold, dtype=np.float64),
+        'left': np.asarray(left, dtype=np.int32),
+        'right': np.asarray(right, dtype=np.int32),
+        'value': np.asarray(value, dtype=np.float64),
+        'missing_left': np.asarray(missing_left, dtype=bool),
+        'zero_missing': np.asarray(zero_missing, dtype=bool),
+    }
+
+
+def _concatenate_trees(trees):
+    """Stack per-tree node tables into one table; child indices become global."""
+    sizes = [len(tree['left']) for tree in trees]
+    offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+    arrays = {'roots': offsets}
+    for key in ('feature', 'threshold', 'value', 'missing_left', 'zero_missing'):
+        arrays[key] = np.concatenate([tree[key] for tree in trees])
+    for key in ('left', 'right'):
+        arrays[key] = np.concatenate([np.where(tree[key] >= 0, tree[key] + offset, -1)
+                                      for tree, offset in zip(trees, offsets)]).astype(np.int32)
+    return arrays
+
+
+def _probe_rows(center, scale, n_features, sample):
+    reference = center if center is not None else np.zeros(n_features)
+    spread = scale if scale is not None else np.ones(n_features)
+    rng = np.random.default_rng(0)
+    rows = [reference + spread * rng.standard_normal((64, n_features))]
+    if sample is not None:
+        rows.append(np.asarray(sample, dtype=np.float64)[:256])
+    return np.vstack(rows)
+
+
+def _write_content_addressed(directory, name, suffix, write):
+    """
+    Write a file atomically. With a `suffix`, the file is named
+    `<name>-<sha256 prefix><suffix>` so its name changes with its content;
+    without one it is written as `name`. Returns the file name.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}-", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        filename = name if suffix is None else f"{name}-{_file_sha256(tmp_path)[:16]}{suffix}"
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(directory, filename))
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return filename
+
+
+def _remove_unreferenced(directory, manifest):
+    """Delete array files of earlier bundles (processes that mapped them keep their mapping)."""
+    for filename in os.listdir(directory):
+        if filename.endswith(('.npy', '.joblib')) and filename not in manifest['files']:
+            os.remove(os.path.join(directory, filename))
+
+
+def _manifest_checksum(manifest):
+    content = {key: value for key, value in manifest.items() if key != 'checksum'}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
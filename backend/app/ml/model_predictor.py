@@ -1,13 +1,27 @@
-import joblib
 import os
 import numpy as np
 import pandas as pd
+from app.ml.model_registry import ModelRegistry
 
-# Path to model components
-BASE_PATH = os.path.dirname(__file__)
+# Path to model components: the bundle written by Model_training.py --output-dir
+BASE_PATH = os.getenv('MODEL_DIR', os.path.dirname(__file__))
 SCALER_PATH = os.path.join(BASE_PATH, 'scaler.pkl')
 MODEL_PATH = os.path.join(BASE_PATH, 'ensemble_model.pkl')  
 FEATURE_NAMES_PATH = os.path.join(BASE_PATH, 'feature_names.pkl')
+# Memory-mappable bundle of the same model; served instead of the pickles when present
+BUNDLE_PATH = os.path.join(BASE_PATH, 'model_bundle')
+
+# Seconds between checks for updated artifacts on disk (negative disables hot reload)
+MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', '5'))
+
+# 'compiled' uses the low-overhead CompiledEnsemble, 'sklearn' the original objects
+INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'compiled')
+
+# Process-wide registry: artifacts are unpickled once and shared by all requests
+model_registry = ModelRegistry(SCALER_PATH, MODEL_PATH, FEATURE_NAMES_PATH,
+                               check_interval=MODEL_RELOAD_INTERVAL,
+                               compiled=INFERENCE_ENGINE == 'compiled',
+                               bundle_path=BUNDLE_PATH)
 
 def predict_parkinson(features: dict) -> float:
     """
@@ -27,13 +41,11 @@ def predict_parkinson(features: dict) -> float:
     float : Predicted motor UPDRS score
     """
     try:
-        # Load required model components
-        scaler = joblib.load(SCALER_PATH)
-        model = joblib.load(MODEL_PATH)
-        feature_names = joblib.load(FEATURE_NAMES_PATH)
-        
-        print(f"Expected features: {feature_names}")
-        print(f"Received features: {list(features.keys())}")
+        # Get the shared model components (loaded once, reloaded on change)
+        bundle = model_registry.get()
+        scaler = bundle.scaler
+        model = bundle.model
+        feature_names = bundle.feature_names
         
         # Validate that all required features are present
         missing_features = [name for name in feature_names if name not in features]
@@ -47,8 +59,15 @@ def predict_parkinson(features: dict) -> float:
                 print(f"Warning: Feature '{name}' has invalid value: {value}")
                 features[name] = 0.0  # Replace with default value
         
-        # Convert dict to ordered array based on feature_names order and create DataFrame with feature names
+        # Convert dict to ordered array based on feature_names order
         input_values = [features[name] for name in feature_names]
+        
+        if bundle.engine is not None:
+            return bundle.engine.predict_one(input_values)
+        
+        # Fall back to the sklearn objects with a DataFrame carrying feature names
+        print(f"Expected features: {feature_names}")
+        print(f"Received features: {list(features.keys())}")
         input_df = pd.DataFrame([input_values], columns=feature_names)
         
         print(f"Input DataFrame shape: {input_df.shape}")
@@ -67,6 +86,61 @@ def predict_parkinson(features: dict) -> float:
     except Exception as e:
         raise Exception(f"Prediction error: {e}")
 
+def predict_parkinson_batch(rows, bundle=None) -> np.ndarray:
+    """
+    Predict motor UPDRS scores for many patients in one vectorized pass.
+    
+    Parameters:
+    -----------
+    rows : pandas.DataFrame or list of dict
+        One row per patient using the same feature names as
+        `predict_parkinson`. Extra columns (e.g. 'subject#', 'motor_UPDRS'
+        from parkinsons_updrs.csv) are ignored.
+    bundle : ModelBundle, optional
+        Model to predict with; defaults to `model_registry.get()`. Pass the
+        bundle whose `version` is reported, so a hot reload in between
+        cannot mismatch the two.
+    
+    Returns:
+    --------
+    numpy.ndarray : Predicted motor UPDRS score for each row, in input order
+    """
+    try:
+        bundle = bundle or model_registry.get()
+        feature_names = bundle.feature_names
+        
+        input_df = rows if isinstance(rows, pd.DataFrame) else pd.DataFrame(list(rows))
+        if input_df.empty:
+            return np.empty(0, dtype=float)
+        
+        missing_features = [name for name in feature_names if name not in input_df.columns]
+        if missing_features:
+            raise ValueError(f"Missing required features: {missing_features}")
+        
+        # Same cleaning rule as the single-row path: invalid values become 0.0
+        input_df = input_df[feature_names].apply(pd.to_numeric, errors='coerce')
+        input_df = input_df.replace([np.inf, -np.inf], np.nan)
+        invalid_count = int(input_df.isna().sum().sum())
+        if invalid_count:
+            print(f"Warning: {invalid_count} invalid feature values replaced with 0.0")
+            input_df = input_df.fillna(0.0)
+        
+        # Scale and predict the whole matrix at once
+        if bundle.engine is not None:
+            return bundle.engine.predict(input_df.to_numpy(dtype=np.float64))
+        
+        scaled_features = bundle.scaler.transform(input_df)
+        predictions = bundle.model.predict(scaled_features)
+        
+        return np.asarray(predictions, dtype=float)
+        
+    except FileNotFoundError as e:
+        raise FileNotFoundError(f"Model file not found: {e}")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise Exception(f"Prediction error: {e}")
+
 def get_required_features():
     """
     Get list of required feature names for the model.
@@ -76,8 +150,7 @@ def get_required_features():
     list : List of required feature names
     """
     try:
-        feature_names = joblib.load(FEATURE_NAMES_PATH)
-        return feature_names.tolist()
+        return list(model_registry.get().feature_names)
     except FileNotFoundError:
         # Fallback list if feature_names.pkl is not available
         return [
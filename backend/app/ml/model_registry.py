@@ -0,0 +1,247 @@
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+
+import joblib
+
+from app.ml.inference_engine import compile_ensemble
+from app.ml.model_bundle import MANIFEST_NAME, load_bundle
+
+# Written next to the pickles after them; holds the artifact_version of the set
+MODEL_VERSION_NAME = 'model_version'
+
+# Loads retried when artifacts change while they are being read
+RELOAD_ATTEMPTS = 5
+RELOAD_RETRY_DELAY = 0.5
+
+
+@dataclass(frozen=True)
+class ModelBundle:
+    """Immutable set of model components that belong to one training run."""
+    scaler: object
+    model: object
+    feature_names: list
+    version: str
+    loaded_at: float
+    engine: object = None
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the loaded model bundle.
+
+    The bundle is unpickled once and shared by every request. On access the
+    registry checks (at most every `check_interval` seconds) whether the
+    artifact files changed on disk; if their content hash differs, a new
+    bundle is loaded and swapped in with a single reference assignment.
+    Requests that already hold the previous bundle finish with it, and
+    requests arriving during the load keep getting it.
+
+    A set of pickles is only accepted if it matches the `model_version`
+    file the training pipeline writes after them (when that file exists)
+    and no file changed while it was read; otherwise the load is retried.
+
+    Parameters:
+    -----------
+    scaler_path, model_path, feature_names_path : str
+        Paths to the joblib artifacts written by the training pipeline.
+    check_interval : float
+        Minimum number of seconds between two on-disk change checks.
+        Use 0 to check on every access, or a negative value to disable
+        hot reloading altogether.
+    compiled : bool
+        Also build a CompiledEnsemble for low-overhead inference.
+    bundle_path : str, optional
+        Directory of a memory-mappable bundle (see model_bundle). When it
+        holds a manifest and `compiled` is set, the bundle is served instead
+        of the pickles: its arrays are mapped read-only and shared by all
+        worker processes, and `scaler` / `model` of the ModelBundle are None.
+    version_path : str, optional
+        Version stamp of the pickles; defaults to `model_version` next to
+        `model_path`.
+    """
+
+    def __init__(self, scaler_path, model_path, feature_names_path, check_interval=5.0,
+                 compiled=True, bundle_path=None, version_path=None):
+        self.paths = (scaler_path, model_path, feature_names_path)
+        self.version_path = version_path or os.path.join(os.path.dirname(model_path),
+                                                         MODEL_VERSION_NAME)
+        self.bundle_path = bundle_path
+        self.check_interval = check_interval
+        self.compiled = compiled
+        self._bundle = None
+        self._file_signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+
+    def get(self) -> ModelBundle:
+        """Return the current bundle, loading or reloading it if needed."""
+        bundle = self._bundle
+        if bundle is None:
+            return self.reload()
+
+        if self.check_interval >= 0 and time.monotonic() - self._last_check >= self.check_interval:
+            try:
+                return self.reload()
+            except Exception as e:
+                # Artifacts may be half-written during a deploy; keep serving
+                # the bundle we have and try again on the next check.
+                print(f"Model reload failed, keeping version {bundle.version}: {e}")
+        return bundle
+
+    def reload(self, force=False) -> ModelBundle:
+        """Load the artifacts from disk if they changed since the last load."""
+        current = self._bundle
+        # One thread loads at a time; while it does, the others keep serving
+        # the current bundle instead of waiting for the load to finish.
+        if not self._load_lock.acquire(blocking=current is None or force):
+            return current
+        try:
+            self._last_check = time.monotonic()
+            bundle, signature = self._load_consistent(force)
+            with self._lock:
+                self._bundle = bundle
+                self._file_signature = signature
+            if bundle is not current:
+                kind = "memory-mapped model bundle" if bundle.scaler is None else "model bundle"
+                print(f"Loaded {kind} version {bundle.version}")
+            return bundle
+        finally:
+            self._load_lock.release()
+
+    def _load_consistent(self, force):
+        """
+        Load one complete set of artifacts and return it with its file signature.
+
+        The files are stat'ed before and after loading; if a deploy replaced
+        any of them in between, the load is retried so that the bundle never
+        mixes files of two training runs. Pickles that do not match the
+        version stamp are retried the same way.
+        """
+        mapped = self._use_mapped_bundle()
+        for attempt in range(RELOAD_ATTEMPTS):
+            signature = self._stat_signature(mapped)
+            if not force and self._bundle is not None and signature == self._file_signature:
+                return self._bundle, signature
+
+            try:
+                bundle = self._load_mapped(force) if mapped else self._load_pickles(force)
+            except Exception:
+                if self._stat_signature(mapped) == signature:
+                    raise
+                bundle = None  # a file disappeared or changed under us
+
+            if bundle is not None and self._stat_signature(mapped) == signature:
+                return bundle, signature
+            print(f"Model artifacts are being replaced (attempt {attempt + 1}), retrying")
+            time.sleep(RELOAD_RETRY_DELAY)
+        raise RuntimeError(f"Model artifacts did not form one consistent set in {RELOAD_ATTEMPTS} attempts")
+
+    def _use_mapped_bundle(self):
+        return (self.compiled and self.bundle_path is not None
+                and os.path.exists(os.path.join(self.bundle_path, MANIFEST_NAME)))
+
+    def _load_pickles(self, force):
+        # Read every file once: the version is the hash of exactly the bytes
+        # that are unpickled.
+        contents = []
+        for path in self.paths:
+            with open(path, 'rb') as f:
+                contents.append(f.read())
+        version = artifact_version(contents)
+
+        stamp = self._read_version_stamp()
+        if stamp is not None and stamp != version:
+            # model_version is written after the pickles, so a training run
+            # is still replacing them; try again once it is complete.
+            return None
+
+        if not force and self._bundle is not None and version == self._bundle.version:
+            # Files were touched or rewritten with identical content.
+            return self._bundle
+
+        scaler, model, feature_names = (joblib.load(io.BytesIO(content)) for content in contents)
+        feature_names = list(feature_names)
+        engine = compile_ensemble(scaler, model, feature_names) if self.compiled else None
+        return ModelBundle(
+            scaler=scaler,
+            model=model,
+            feature_names=feature_names,
+            version=version,
+            loaded_at=time.time(),
+            engine=engine,
+        )
+
+    def _load_mapped(self, force):
+        engine, manifest = load_bundle(self.bundle_path)
+        version = manifest['checksum'][:12]
+        if not force and self._bundle is not None and version == self._bundle.version:
+            return self._bundle
+        return ModelBundle(
+            scaler=None,
+            model=None,
+            feature_names=list(manifest['feature_names']),
+            version=version,
+            loaded_at=time.time(),
+            engine=engine,
+        )
+
+    def _read_version_stamp(self):
+        try:
+            with open(self.version_path) as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return None
+
+    def _stat_signature(self, mapped):
+        # manifest.json is replaced last when a bundle is written, so its
+        # stat identifies the whole memory-mapped bundle
+        paths = [os.path.join(self.bundle_path, MANIFEST_NAME)] if mapped else [*self.paths, self.version_path]
+        signature = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                if path != self.version_path:
+                    raise
+                signature.append(None)
+            else:
+                signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+
+def artifact_version(contents):
+    """Version of a pickled model: SHA-256 prefix of scaler, model and feature names bytes."""
+    digest = hashlib.sha256()
+    for content in contents:
+        digest.update(content)
+    return digest.hexdigest()[:12]
+
+
+def write_model_version(paths, version_path):
+    """
+    Write the version of the artifacts at `paths` to `version_path`.
+
+    Called by the training pipeline after the pickles are in place; the
+    registry only loads pickles whose hash matches this file, so a reader
+    never combines files of two runs.
+    """
+    contents = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            contents.append(f.read())
+    directory, name = os.path.split(os.path.abspath(version_path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{name}-", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(artifact_version(contents) + "\n")
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, version_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
@@ -1,5 +1,22 @@
-from fastapi import APIRouter, Form, File, UploadFile, HTTPException
+from fastapi import APIRouter, Form, File, UploadFile, HTTPException, Request
+from starlette.concurrency import run_in_threadpool
 from app.services.voice_analyze_service import process_audio_and_predict
+from app.services.job_queue import job_queue, JobQueueFullError
+from app.utils.file_handler import (
+    get_audio_suffix,
+    read_upload,
+    check_wav_duration,
+    measure_upload,
+    compressed_decoder,
+    UploadTooLargeError,
+    AudioTooLongError,
+    DecoderUnavailableError,
+)
+from app.services.analysis_pool import AnalysisPoolFullError
+from app.services.decoder_pool import DecoderPoolFullError
+from app.services.batch_predict_service import parse_batch_rows, predict_batch
+from app.services.feature_cache import feature_cache
+from app.services.metrics import track_analysis
 
 
 router = APIRouter(
@@ -25,7 +42,7 @@ async def test_endpoint(
             "audio_file": {
                 "filename": audio_file.filename,
                 "content_type": audio_file.content_type,
-                "size": len(await audio_file.read()) if audio_file else 0
+                "size": await measure_upload(audio_file) if audio_file else 0
             }
         },
         "status": "success"
@@ -33,6 +50,7 @@ async def test_endpoint(
 
 @router.post("/voice")
 async def analyze_voice(
+    request: Request,
     name: str = Form(..., min_length=1, max_length=100),
     age: int = Form(..., gt=10, lt=120),
     sex: str = Form(..., regex="^(male|female)$"),
@@ -63,14 +81,94 @@ async def analyze_voice(
     print(f"Basic info being passed to service: {basic_info}")
     
     try:
-        result = await process_audio_and_predict(audio_file, basic_info)
+        # Time from the arrival of the request, like the upload stage, so
+        # that the total covers every stage
+        received_at = getattr(request.state, "received_at", None)
+        with track_analysis("request", received_at):
+            result = await process_audio_and_predict(audio_file, basic_info, received_at)
 
         print("\nSENDING RESPONSE TO FRONTEND:")
         print(f"Response: {result}\n")
         return result
+    except (UploadTooLargeError, AudioTooLongError) as e:
+        print(f"Rejecting upload: {e}")
+        raise HTTPException(status_code=413, detail=str(e))
+    except DecoderUnavailableError as e:
+        print(f"Rejecting upload, no decoder: {e}")
+        raise HTTPException(status_code=415, detail=f"{e}; upload a WAV file instead")
+    except (AnalysisPoolFullError, DecoderPoolFullError) as e:
+        print(f"Rejecting request, server busy: {e}")
+        raise HTTPException(status_code=503, detail="Server busy, please retry shortly",
+                            headers={"Retry-After": "5"})
     except Exception as e:
         print("=" * 50)
         print("ERROR OCCURRED:")
         print(f"Error: {str(e)}")
         print(f"Error type: {type(e).__name__}\n")
-        raise e
\ No newline at end of file
+        raise e
+
+@router.post("/jobs", status_code=202)
+async def submit_voice_job(
+    name: str = Form(..., min_length=1, max_length=100),
+    age: int = Form(..., gt=10, lt=120),
+    sex: str = Form(..., regex="^(male|female)$"),
+    test_time: float = Form(..., gt=0),
+    audio_file: UploadFile = File(...) ):
+    """
+    Queue a voice analysis and return immediately with a job id.
+
+    Poll `GET /analyze/jobs/{job_id}` for the status and result.
+    """
+    if not audio_file or audio_file.filename == "":
+        raise HTTPException(status_code=400, detail="No audio file provided")
+
+    basic_info = {"age": age, "sex": sex, "name": name, "test_time": test_time}
+    try:
+        content = await read_upload(audio_file)
+        check_wav_duration(content)
+    except (UploadTooLargeError, AudioTooLongError) as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    suffix = get_audio_suffix(audio_file, content)
+    if suffix != ".wav" and compressed_decoder() is None:
+        raise HTTPException(status_code=415, detail=f"Cannot decode {suffix} audio on this server; "
+                                                    "upload a WAV file instead")
+
+    try:
+        job_id = await job_queue.submit(content, suffix, basic_info)
+    except JobQueueFullError as e:
+        print(f"Rejecting job, queue full: {e}")
+        raise HTTPException(status_code=503, detail="Job queue is full, please retry later",
+                            headers={"Retry-After": "30"})
+
+    print(f"Queued analysis job {job_id}")
+    return {"job_id": job_id, "status": "queued"}
+
+@router.get("/jobs/{job_id}")
+async def get_voice_job(job_id: str):
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/batch")
+async def analyze_batch(request: Request):
+    """
+    Score many feature rows at once.
+
+    The body is either a JSON array of feature objects or a CSV file
+    (`Content-Type: text/csv`) in the parkinsons_updrs.csv column schema.
+    """
+    body = await request.body()
+    if not body:
+        raise HTTPException(status_code=400, detail="Empty request body")
+
+    try:
+        rows = parse_batch_rows(body, request.headers.get("content-type"))
+        return await run_in_threadpool(predict_batch, rows)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/cache")
+def feature_cache_stats():
+    """Hit/miss counters of the voice feature cache."""
+    return feature_cache.stats()
@@ -0,0 +1,27 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from app.services.startup import startup
+
+
+router = APIRouter(
+    tags=["health"],
+)
+
+@router.get("/healthz")
+def healthz():
+    """Liveness: 200 while the process is up, 503 once the startup warm-up gave up."""
+    if startup.failed:
+        return JSONResponse(status_code=503, content={"status": "failed", "error": startup.error})
+    return {"status": "ok"}
+
+@router.get("/readyz")
+def readyz():
+    """Readiness: 200 once the model is loaded and the workers are warmed up, else 503."""
+    if startup.ready:
+        return {"status": "ready", "timings": startup.timings}
+    status = "failed" if startup.failed else "starting"
+    return JSONResponse(
+        status_code=503,
+        content={"status": status, "error": startup.error, "attempts": startup.attempts,
+                 "timings": startup.timings},
+    )
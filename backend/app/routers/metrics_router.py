@@ -0,0 +1,12 @@
+from fastapi import APIRouter, Response
+from app.services.metrics import CONTENT_TYPE, registry
+
+
+router = APIRouter(
+    tags=["metrics"],
+)
+
+@router.get("/metrics")
+def metrics():
+    """Latency histograms, failure counters and gauges in the Prometheus text format."""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,83 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# Number of worker processes running feature extraction and inference
+ANALYSIS_WORKERS = int(os.getenv('ANALYSIS_WORKERS', str(os.cpu_count() or 1)))
+
+# Jobs allowed to wait for a free worker before new requests are rejected
+ANALYSIS_QUEUE_DEPTH = int(os.getenv('ANALYSIS_QUEUE_DEPTH', str(4 * ANALYSIS_WORKERS)))
+
+
+class AnalysisPoolFullError(Exception):
+    """Raised when the pool already has the maximum number of pending jobs."""
+
+
+class AnalysisPool:
+    """
+    Bounded process pool for the CPU-heavy parts of a request.
+
+    Work is run with `run_in_executor`, so the event loop keeps serving
+    other requests while Praat and the model run in worker processes. At
+    most `workers + queue_depth` jobs are admitted at once; beyond that
+    `run` fails fast with AnalysisPoolFullError instead of queueing
+    without bound.
+    """
+
+    def __init__(self, workers=ANALYSIS_WORKERS, queue_depth=ANALYSIS_QUEUE_DEPTH):
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.pending = 0
+        self._executor = None
+
+    @property
+    def capacity(self):
+        return self.workers + self.queue_depth
+
+    async def run(self, fn, *args):
+        """Run `fn(*args)` in a worker process and return its result."""
+        # The event loop is single-threaded, so the counter needs no lock.
+        if self.pending >= self.capacity:
+            raise AnalysisPoolFullError(
+                f"Analysis queue is full ({self.pending} jobs pending)"
+            )
+
+        self.pending += 1
+        executor = self._get_executor()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, fn, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool for
+            # the next request instead of failing every request from now on.
+            self._reset_executor(executor)
+            raise
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return self._executor
+
+    def _reset_executor(self, executor):
+        # Every request that was running on the broken pool gets here; only
+        # the first one replaces it, the others must not discard the new pool.
+        if self._executor is not executor:
+            return
+        print("Analysis worker died, restarting process pool")
+        self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+analysis_pool = AnalysisPool()
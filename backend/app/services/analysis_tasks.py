@@ -0,0 +1,171 @@
+import io
+import os
+import time
+import wave
+import numpy as np
+import parselmouth
+from app.ml.model_predictor import model_registry, predict_parkinson
+from app.services.feature_cache import audio_blocks_cache_key, audio_cache_key, get_feature_store
+from app.utils.file_handler import decode_audio_bytes, iter_audio_windows
+from app.utils.voice_data_extraction import extract_voice_features, extract_windowed_features
+
+# Functions in this module run inside the analysis worker processes, so they
+# must be importable at module level and take/return picklable values.
+
+
+def extract_features_from_bytes(content, suffix, params):
+    """
+    Decode uploaded audio in memory and extract its voice features.
+
+    The decoded samples are hashed together with the extraction parameters;
+    if the on-disk feature cache already holds that key, Praat is skipped.
+    Besides the voice features, features['voice_activity'] reports how
+    much of the recording was trimmed as silence before the analysis.
+
+    With a window length in `params` the segmented analysis is used
+    instead, see `extract_windowed_features_from_bytes`.
+
+    Returns:
+    --------
+    dict : {'key': cache key, 'features': voice features,
+            'source': 'disk' or 'computed',
+            'timings': seconds per stage ('conversion', 'extraction', ...)}
+    """
+    if params.get('window_seconds'):
+        return extract_windowed_features_from_bytes(content, suffix, params)
+
+    start = time.perf_counter()
+    samples, sample_rate = decode_audio_bytes(content, suffix)
+    key = audio_cache_key(samples, sample_rate, params)
+    timings = {"conversion": time.perf_counter() - start}
+
+    store = get_feature_store()
+    if store is not None:
+        features = store.get(key)
+        if features is not None:
+            return {"key": key, "features": features, "source": "disk", "timings": timings}
+
+    sound = parselmouth.Sound(samples, sampling_frequency=sample_rate)
+    activity = {}
+    features = extract_voice_features(sound, params['features'], params['perturbation_engine'],
+                                      timings=timings, trim_silence=params['voice_activity_trim'],
+                                      activity=activity, rates=params['analysis_rates'],
+                                      downmix=params['downmix'])
+    features["voice_activity"] = activity
+
+    if store is not None:
+        store.put(key, features)
+    return {"key": key, "features": features, "source": "computed", "timings": timings}
+
+
+def extract_windowed_features_from_bytes(content, suffix, params):
+    """
+    Segmented analysis: extract features window by window and aggregate them.
+
+    The audio is streamed twice, once to compute the cache key and once for
+    the analysis, each time holding a single window of samples. The
+    per-window results are returned under features['windows'] as a list of
+    {'start', 'end', 'voiced_frames', 'features'}, with undefined values
+    (e.g. the nonlinear features of a short voiced stretch) as None.
+
+    Returns:
+    --------
+    dict : same as `extract_features_from_bytes`
+    """
+    window = params['window_seconds']
+    hop = window - params['window_overlap']
+
+    start = time.perf_counter()
+    blocks = ((samples, rate) for _, samples, rate in iter_audio_windows(content, suffix, window, window))
+    key = audio_blocks_cache_key(blocks, params)
+    timings = {"conversion": time.perf_counter() - start}
+
+    store = get_feature_store()
+    if store is not None:
+        features = store.get(key)
+        if features is not None:
+            return {"key": key, "features": features, "source": "disk", "timings": timings}
+
+    features, windows = extract_windowed_features(
+        iter_audio_windows(content, suffix, window, hop), params['features'],
+        params['perturbation_engine'], timings=timings, trim_silence=params['voice_activity_trim'],
+        rates=params['analysis_rates'], downmix=params['downmix'],
+    )
+    # Overlapping stretches count once per window they were analyzed in
+    analyzed = sum(window["end"] - window["start"] - window["dropped_seconds"] for window in windows)
+    dropped = sum(window["dropped_seconds"] for window in windows)
+    features["voice_activity"] = {"duration": windows[-1]["end"] - windows[0]["start"],
+                                  "analyzed_seconds": analyzed, "dropped_seconds": dropped}
+    features["windows"] = [
+        {**window, "features": {name: _finite_or_none(value) for name, value in window["features"].items()}}
+        for window in windows
+    ]
+
+    if store is not None:
+        store.put(key, features)
+    return {"key": key, "features": features, "source": "computed", "timings": timings}
+
+
+def _finite_or_none(value):
+    return float(value) if np.isfinite(value) else None
+
+
+def predict_from_features(features):
+    """
+    Run the model on one feature row.
+
+    Returns:
+    --------
+    dict : {'prediction': motor UPDRS, 'timings': {'inference': seconds}}
+    """
+    start = time.perf_counter()
+    prediction = predict_parkinson(features)
+    return {"prediction": prediction, "timings": {"inference": time.perf_counter() - start}}
+
+
+def warm_up_worker(params, basic_features):
+    """
+    Prepare a fresh worker process before it serves traffic.
+
+    Loads the model and runs one decode, extraction and prediction on a
+    synthetic sustained vowel, so imports, unpickling and Praat's first-call
+    initialization are paid here rather than by the first request. The
+    feature cache is bypassed.
+
+    Returns:
+    --------
+    dict : {'pid': worker process id, 'timings': seconds per warm-up phase}
+    """
+    timings = {}
+    start = time.perf_counter()
+    model_registry.get()
+    timings["model_load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    samples, sample_rate = decode_audio_bytes(_synthetic_vowel_wav(), '.wav')
+    sound = parselmouth.Sound(samples, sampling_frequency=sample_rate)
+    features = extract_voice_features(sound, params['features'], params['perturbation_engine'],
+                                      rates=params['analysis_rates'], downmix=params['downmix'])
+    timings["first_extraction"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    predict_parkinson({**basic_features, **features})
+    timings["first_prediction"] = time.perf_counter() - start
+    return {"pid": os.getpid(), "timings": timings}
+
+
+def _synthetic_vowel_wav(duration=1.0, sample_rate=16000, f0=140.0):
+    """Mono 16-bit WAV of a harmonic tone with slight pitch jitter, enough voiced frames for every feature."""
+    rng = np.random.default_rng(0)
+    frequency = f0 * (1.0 + 0.01 * rng.standard_normal(int(duration * sample_rate)))
+    phase = 2 * np.pi * np.cumsum(frequency) / sample_rate
+    signal = np.sin(phase) + 0.5 * np.sin(2 * phase) + 0.25 * np.sin(3 * phase)
+    signal = 0.3 * signal / np.abs(signal).max() + 0.002 * rng.standard_normal(len(signal))
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes((np.clip(signal, -1.0, 1.0) * 32767).astype('<i2').tobytes())
+    return buffer.getvalue()
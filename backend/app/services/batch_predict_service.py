@@ -0,0 +1,55 @@
+import io
+import json
+import pandas as pd
+from app.ml.model_predictor import model_registry, predict_parkinson_batch
+
+MAX_BATCH_ROWS = 100_000
+
+
+def parse_batch_rows(body: bytes, content_type: str) -> pd.DataFrame:
+    """
+    Parse a batch request body into a DataFrame.
+
+    Accepts either a CSV document in the parkinsons_updrs.csv column schema
+    (content type `text/csv`) or a JSON array of feature objects. A JSON
+    object with a `rows` key is also accepted.
+    """
+    content_type = (content_type or "").lower()
+
+    if "csv" in content_type:
+        try:
+            rows = pd.read_csv(io.BytesIO(body))
+        except Exception as e:
+            raise ValueError(f"Invalid CSV body: {e}")
+    else:
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON body: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get("rows")
+        if not isinstance(payload, list) or not all(isinstance(row, dict) for row in payload):
+            raise ValueError("Expected a JSON array of feature objects")
+        rows = pd.DataFrame(payload)
+
+    if len(rows) > MAX_BATCH_ROWS:
+        raise ValueError(f"Batch too large: {len(rows)} rows (max {MAX_BATCH_ROWS})")
+
+    return rows
+
+
+def predict_batch(rows: pd.DataFrame):
+    print(f"BATCH PREDICTION: {len(rows)} rows")
+
+    # Report the version of the bundle that made the predictions
+    bundle = model_registry.get()
+    predictions = predict_parkinson_batch(rows, bundle)
+
+    return {
+        "count": len(predictions),
+        "model_version": bundle.version,
+        "results": [
+            {"row": i, "prediction": float(prediction)}
+            for i, prediction in enumerate(predictions)
+        ],
+    }
@@ -0,0 +1,174 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from app.services.analysis_pool import ANALYSIS_WORKERS
+from app.utils.file_handler import (
+    FFMPEG_BINARY,
+    DecodeTimeoutError,
+    DecoderUnavailableError,
+    compressed_decoder,
+    decode_compressed,
+)
+
+# Worker processes decoding compressed uploads concurrently
+DECODER_WORKERS = int(os.getenv('DECODER_WORKERS', str(ANALYSIS_WORKERS)))
+
+# Decodes allowed to wait for a free decoder before new ones are rejected
+DECODER_QUEUE_DEPTH = int(os.getenv('DECODER_QUEUE_DEPTH', str(4 * DECODER_WORKERS)))
+
+# Seconds a single decode may take before its worker process is killed
+DECODER_TIMEOUT = float(os.getenv('DECODER_TIMEOUT', '30'))
+
+
+class DecoderPoolFullError(Exception):
+    """Raised when the decoder pool already has the maximum number of pending decodes."""
+
+
+class DecoderPool:
+    """
+    Bounded pool of decoder processes for compressed uploads, owned by the API process.
+
+    Untrusted uploads are decoded in `workers` separate processes, never in
+    the API process: inside a worker, PyAV (the FFmpeg libraries) decodes
+    in-process, or the ffmpeg executable when PyAV is not installed. A
+    worker that crashes in native code breaks only its pool, which is
+    replaced; the decodes that were running in it are retried once in the
+    new pool. A decode still running after `timeout` (for instance stuck
+    inside the decoder, where no Python-level check can stop it) has its
+    worker processes killed and fails with DecodeTimeoutError; this also
+    applies when the request that started it has gone away.
+
+    A decoder slot is held until the worker has actually finished, and like
+    AnalysisPool, at most `workers + queue_depth` decodes are admitted at
+    once; beyond that `decode` fails fast with DecoderPoolFullError.
+    """
+
+    def __init__(self, workers=DECODER_WORKERS, queue_depth=DECODER_QUEUE_DEPTH, timeout=DECODER_TIMEOUT):
+        self.workers = max(1, workers)
+        self.queue_depth = max(0, queue_depth)
+        self.timeout = timeout
+        self.pending = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self._executor = None
+        self._slots = None
+
+    @property
+    def capacity(self):
+        return self.workers + self.queue_depth
+
+    def start(self):
+        """Report which decoder compressed uploads will use."""
+        decoder = compressed_decoder()
+        if decoder is None:
+            print(f"Neither PyAV nor {FFMPEG_BINARY} is installed, compressed uploads cannot be decoded")
+        else:
+            print(f"Decoding compressed uploads with {decoder} in {self.workers} worker processes")
+
+    async def decode(self, content, suffix):
+        """
+        Decode a compressed upload in a worker process.
+
+        Returns:
+        --------
+        bytes : WAV file of 32-bit float samples, see
+                `file_handler.decode_compressed`
+        """
+        # The event loop is single-threaded, so the counter needs no lock.
+        if self.pending >= self.capacity:
+            raise DecoderPoolFullError(f"Decoder queue is full ({self.pending} decodes pending)")
+        if compressed_decoder() is None:
+            raise DecoderUnavailableError(
+                f"Cannot decode {suffix} audio: neither PyAV nor {FFMPEG_BINARY} is installed"
+            )
+
+        self.pending += 1
+        try:
+            try:
+                return await self._run(content, suffix)
+            except BrokenProcessPool:
+                # A worker crashed, or was killed because another decode
+                # timed out; try once more in the replacement pool.
+                pass
+            try:
+                return await self._run(content, suffix)
+            except BrokenProcessPool:
+                raise Exception("Failed to decode audio file: the decoder process crashed")
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, content, suffix):
+        loop = asyncio.get_running_loop()
+        slots = self._get_slots()
+        await slots.acquire()
+        executor = self._get_executor()
+        try:
+            future = executor.submit(decode_compressed, content, suffix, self.timeout)
+        except BaseException as e:
+            slots.release()
+            if isinstance(e, BrokenProcessPool):
+                self._reset_executor(executor)
+            raise
+
+        expired = False
+
+        def expire():
+            nonlocal expired
+            if not future.done():
+                expired = True
+                self.timeouts += 1
+                print(f"Decode exceeded {self.timeout:g} s, killing the decoder processes")
+                self._reset_executor(executor, kill=True)
+
+        timer = loop.call_later(self.timeout, expire)
+
+        def finished(_):
+            # Runs in the executor's thread once the worker is done (or dead)
+            loop.call_soon_threadsafe(timer.cancel)
+            loop.call_soon_threadsafe(slots.release)
+
+        future.add_done_callback(finished)
+        try:
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            if expired:
+                raise DecodeTimeoutError(f"Decoding took longer than {self.timeout:g} s")
+            self._reset_executor(executor)
+            raise
+
+    def _get_executor(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return self._executor
+
+    def _reset_executor(self, executor, kill=False):
+        if kill:
+            # The decode may be stuck in native code; only killing its process stops it
+            for process in list((getattr(executor, '_processes', None) or {}).values()):
+                process.kill()
+        # Every decode that was running in the broken pool gets here; only
+        # the first one replaces it.
+        if self._executor is not executor:
+            return
+        print("Decoder worker pool broken, starting a new one")
+        self.restarts += 1
+        self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_slots(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        return self._slots
+
+
+decoder_pool = DecoderPool()
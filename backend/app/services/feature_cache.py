@@ -0,0 +1,225 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Entries kept in the in-memory LRU tier (0 disables it)
+FEATURE_CACHE_SIZE = int(os.getenv('FEATURE_CACHE_SIZE', '256'))
+
+# Optional SQLite file for the on-disk tier, shared by all worker processes
+FEATURE_CACHE_DB = os.getenv('FEATURE_CACHE_DB', '')
+
+# Size budget of the on-disk tier; least recently used rows are evicted first
+FEATURE_CACHE_DB_MAX_MB = float(os.getenv('FEATURE_CACHE_DB_MAX_MB', '256'))
+
+
+def params_fingerprint(params):
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def audio_cache_key(samples, sample_rate, params):
+    """Content address of decoded audio plus the extraction parameters."""
+    digest = hashlib.sha256()
+    samples = np.ascontiguousarray(samples, dtype=np.float64)
+    digest.update(str(samples.shape).encode())
+    digest.update(str(float(sample_rate)).encode())
+    digest.update(params_fingerprint(params).encode())
+    digest.update(memoryview(samples).cast('B'))
+    return digest.hexdigest()
+
+
+def audio_blocks_cache_key(blocks, params):
+    """
+    `audio_cache_key` computed incrementally over consecutive sample blocks.
+
+    Used by the segmented analysis, which never holds the whole decoded
+    recording. `blocks` yields (samples, sample_rate) with samples shaped
+    (channels, n); the key covers the total shape, the rate and every sample.
+    """
+    digest = hashlib.sha256()
+    digest.update(params_fingerprint(params).encode())
+    channels, frames, sample_rate = 0, 0, 0.0
+    for samples, sample_rate in blocks:
+        channels, frames = samples.shape[0], frames + samples.shape[1]
+        # Frame-major, so the digest does not depend on where blocks are cut
+        interleaved = np.ascontiguousarray(samples.T, dtype=np.float64)
+        digest.update(memoryview(interleaved).cast('B'))
+    digest.update(str((channels, frames)).encode())
+    digest.update(str(float(sample_rate)).encode())
+    return digest.hexdigest()
+
+
+def upload_digest(content, suffix, params):
+    """Digest of the raw upload, used to coalesce identical in-flight uploads."""
+    digest = hashlib.sha256()
+    digest.update(suffix.encode())
+    digest.update(params_fingerprint(params).encode())
+    digest.update(content)
+    return digest.hexdigest()
+
+
+class FeatureStore:
+    """
+    On-disk SQLite tier of the feature cache.
+
+    Rows are keyed by `audio_cache_key`. When the stored payloads exceed
+    `max_bytes`, the least recently accessed rows are deleted. The store is
+    opened lazily so it can be used from the analysis worker processes.
+    """
+
+    def __init__(self, path, max_bytes):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn = None
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT value FROM features WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE features SET last_access = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def put(self, key, features):
+        value = json.dumps(features)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO features (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM features").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM features ORDER BY last_access"):
+            stale.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM features WHERE key = ?", stale)
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS features ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+
+_stores = {}
+
+
+def get_feature_store():
+    """Return this process's FeatureStore, or None if the disk tier is disabled."""
+    if not FEATURE_CACHE_DB:
+        return None
+    store = _stores.get(FEATURE_CACHE_DB)
+    if store is None:
+        store = FeatureStore(FEATURE_CACHE_DB, int(FEATURE_CACHE_DB_MAX_MB * 1024 * 1024))
+        _stores[FEATURE_CACHE_DB] = store
+    return store
+
+
+class FeatureCache:
+    """
+    In-memory LRU tier plus single-flight coalescing, owned by the API process.
+
+    `compute` is awaited at most once per distinct upload at a time;
+    concurrent identical uploads wait for the same result. It must return a
+    dict with the audio `key`, the extracted `features` and the `source`
+    ("disk" or "computed") reported by the worker. `compute` runs in its own
+    task, so a caller that is cancelled (e.g. its client disconnected) does
+    not cancel it for the others waiting on the same upload.
+    """
+
+    def __init__(self, max_entries=FEATURE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._aliases = OrderedDict()
+        self._inflight = {}
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get_or_compute(self, digest, compute):
+        features = self._lookup(digest)
+        if features is not None:
+            self.memory_hits += 1
+            return dict(features)
+
+        pending = self._inflight.get(digest)
+        if pending is not None:
+            self.coalesced += 1
+            return dict(await asyncio.shield(pending))
+
+        task = asyncio.get_running_loop().create_task(self._compute(digest, compute))
+        # Retrieved here in case every caller is gone by the time it fails
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self._inflight[digest] = task
+        return dict(await asyncio.shield(task))
+
+    async def _compute(self, digest, compute):
+        try:
+            result = await compute()
+        finally:
+            del self._inflight[digest]
+
+        if result['source'] == 'disk':
+            self.disk_hits += 1
+        else:
+            self.misses += 1
+        self._store(digest, result['key'], result['features'])
+        return result['features']
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses + self.coalesced
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (lookups - self.misses) / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_tier": bool(FEATURE_CACHE_DB),
+        }
+
+    def _lookup(self, digest):
+        key = self._aliases.get(digest)
+        if key is None or key not in self._entries:
+            return None
+        self._aliases.move_to_end(digest)
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    def _store(self, digest, key, features):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = features
+        self._entries.move_to_end(key)
+        self._aliases[digest] = key
+        self._aliases.move_to_end(digest)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        while len(self._aliases) > self.max_entries:
+            self._aliases.popitem(last=False)
+
+
+feature_cache = FeatureCache()
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from app.services.analysis_pool import ANALYSIS_WORKERS, AnalysisPoolFullError
+from app.services.decoder_pool import DecoderPoolFullError
+from app.services.metrics import track_analysis
+from app.services.voice_analyze_service import analyze_audio_content
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# SQLite file holding queued jobs and their results; survives restarts
+JOB_QUEUE_DB = os.getenv('JOB_QUEUE_DB', os.path.join(BACKEND_DIR, 'analysis_jobs.db'))
+
+# Jobs processed concurrently by this API process
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', str(ANALYSIS_WORKERS)))
+
+# Queued jobs accepted before new submissions are rejected
+JOB_QUEUE_MAX = int(os.getenv('JOB_QUEUE_MAX', '1000'))
+
+# Finished jobs older than this are deleted
+JOB_RETENTION_HOURS = float(os.getenv('JOB_RETENTION_HOURS', '24'))
+
+# Seconds a claimed job stays owned by its process without a heartbeat;
+# running jobs whose lease expired are put back in the queue
+JOB_LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '60'))
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFullError(Exception):
+    """Raised when JOB_QUEUE_MAX jobs are already waiting."""
+
+
+class JobStore:
+    """
+    Durable job table in SQLite.
+
+    The uploaded audio is stored with the job until it finishes, so queued
+    jobs survive a server restart. A running job records the process that
+    claimed it (`owner`) and a `lease_until` deadline that the owner keeps
+    extending; only jobs whose lease expired are taken back from another
+    process. All methods are blocking and meant to be called through
+    `asyncio.to_thread`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, "
+            "suffix TEXT NOT NULL, basic_info TEXT NOT NULL, audio BLOB, "
+            "result TEXT, error TEXT, owner TEXT, lease_until REAL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+            if column not in columns:
+                # Job table created before leases were added
+                self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    def submit(self, content, suffix, basic_info, max_queued):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                queued = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)
+                ).fetchone()[0]
+                if queued >= max_queued:
+                    raise JobQueueFullError(f"Job queue is full ({queued} jobs queued)")
+                self._conn.execute(
+                    "INSERT INTO jobs (id, status, created_at, updated_at, suffix, basic_info, audio) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, QUEUED, now, now, suffix, json.dumps(basic_info), content),
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def claim(self, owner, lease_seconds):
+        """Mark the oldest queued job as running under `owner` and return it, or None."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, suffix, basic_info, audio FROM jobs WHERE status = ? "
+                    "ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is not None:
+                    now = time.time()
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, updated_at = ?, owner = ?, lease_until = ? "
+                        "WHERE id = ?",
+                        (RUNNING, now, owner, now + lease_seconds, row[0]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {"id": row[0], "suffix": row[1], "basic_info": json.loads(row[2]), "audio": row[3]}
+
+    def finish(self, job_id, owner, result=None, error=None):
+        """Store the outcome of a job, unless its lease was lost to another process."""
+        status = FAILED if error is not None else DONE
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, result = ?, error = ?, audio = NULL, "
+                "owner = NULL, lease_until = NULL WHERE id = ? AND status = ? AND owner = ?",
+                (status, time.time(), json.dumps(result) if result is not None else None,
+                 error, job_id, RUNNING, owner),
+            )
+            return cursor.rowcount
+
+    def requeue(self, job_id, owner):
+        """Put a job claimed by `owner` back in the queue."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND status = ? AND owner = ?",
+                (QUEUED, time.time(), job_id, RUNNING, owner),
+            )
+            return cursor.rowcount
+
+    def requeue_expired(self):
+        """Put running jobs whose owner stopped renewing the lease back in the queue."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, owner = NULL, lease_until = NULL "
+                "WHERE status = ? AND (lease_until IS NULL OR lease_until < ?)",
+                (QUEUED, now, RUNNING, now),
+            )
+            return cursor.rowcount
+
+    def renew(self, owner, lease_seconds):
+        """Extend the lease of every job running under `owner`."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE status = ? AND owner = ?",
+                (time.time() + lease_seconds, RUNNING, owner),
+            )
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, created_at, updated_at, result, error FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row[0],
+            "status": row[1],
+            "created_at": row[2],
+            "updated_at": row[3],
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+        }
+
+    def purge(self, older_than):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (DONE, FAILED, older_than),
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobQueue:
+    """
+    Runs queued voice analysis jobs in the background of the API process.
+
+    `start` resumes jobs whose owner died without finishing them and launches
+    JOB_WORKERS asyncio tasks. Each task claims one job at a time and runs
+    the same analysis as `/analyze/voice` through the analysis pool, while a
+    heartbeat task keeps the leases of the running jobs alive. Several API
+    processes can share one JOB_QUEUE_DB.
+    """
+
+    def __init__(self, path=JOB_QUEUE_DB, workers=JOB_WORKERS, max_queued=JOB_QUEUE_MAX,
+                 lease_seconds=JOB_LEASE_SECONDS):
+        self.path = path
+        self.workers = max(1, workers)
+        self.max_queued = max_queued
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.store = None
+        self._tasks = []
+        self._wakeup = None
+        self._last_purge = 0.0
+
+    async def start(self):
+        self.store = await asyncio.to_thread(JobStore, self.path)
+        await self._resume_expired()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.store is not None:
+            self.store.close()
+            self.store = None
+
+    async def submit(self, content, suffix, basic_info):
+        job_id = await asyncio.to_thread(self.store.submit, content, suffix, basic_info,
+                                         self.max_queued)
+        self._wakeup.set()
+        return job_id
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def _resume_expired(self):
+        resumed = await asyncio.to_thread(self.store.requeue_expired)
+        if resumed:
+            print(f"Resuming {resumed} interrupted analysis jobs")
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.store.renew, self.owner, self.lease_seconds)
+                await self._resume_expired()
+            except sqlite3.Error as e:
+                print(f"Job lease renewal failed: {e}")
+
+    async def _worker(self):
+        while True:
+            job = await asyncio.to_thread(self.store.claim, self.owner, self.lease_seconds)
+            if job is None:
+                await self._idle()
+                continue
+
+            try:
+                with track_analysis("job"):
+                    result = await analyze_audio_content(job["audio"], job["suffix"], job["basic_info"])
+            except asyncio.CancelledError:
+                # Shutting down: leave the job for the next start
+                await asyncio.to_thread(self.store.requeue, job["id"], self.owner)
+                raise
+            except (AnalysisPoolFullError, DecoderPoolFullError):
+                # Interactive requests are using every worker; retry later
+                await asyncio.to_thread(self.store.requeue, job["id"], self.owner)
+                await asyncio.sleep(1.0)
+            except Exception as e:
+                print(f"Analysis job {job['id']} failed: {type(e).__name__}: {e}")
+                await self._finish(job["id"], error=str(e))
+            else:
+                await self._finish(job["id"], result=result)
+
+    async def _finish(self, job_id, result=None, error=None):
+        stored = await asyncio.to_thread(self.store.finish, job_id, self.owner, result, error)
+        if not stored:
+            print(f"Analysis job {job_id} lost its lease; result discarded")
+
+    async def _idle(self):
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+
+        now = time.time()
+        if now - self._last_purge > 600:
+            self._last_purge = now
+            await asyncio.to_thread(self.store.purge, now - JOB_RETENTION_HOURS * 3600)
+
+
+job_queue = JobQueue()
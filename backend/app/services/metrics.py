@@ -0,0 +1,270 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services.analysis_pool import analysis_pool
+from app.services.decoder_pool import decoder_pool
+
+# Histogram bucket upper bounds in seconds, from a cached lookup to a long recording
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labelvalues):
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+        return tuple(str(value) for value in labelvalues)
+
+    def _labels(self, key, extra=()):
+        pairs = list(zip(self.labelnames, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, one series per label combination.
+
+    With `callback`, the count is read when the metrics are rendered, e.g.
+    a total kept by a pool that cannot import this module.
+    """
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1.0):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        if self.callback is not None:
+            return [f"{self.name} {_number(self.callback())}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_number(value)}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down.
+
+    With `callback`, the value is read when the metrics are rendered, e.g.
+    the current queue length of a pool.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=(), callback=None):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self._values = {}
+
+    def inc(self, *labelvalues, amount=1.0):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, *labelvalues, amount=1.0):
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value, *labelvalues):
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def _samples(self):
+        if self.callback is not None:
+            return [f"{self.name} {_number(self.callback())}"]
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{self._labels(key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(_Metric):
+    """Cumulative histogram of observed values (seconds) with a sum and count."""
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, *labelvalues):
+        key = self._key(labelvalues)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *labelvalues):
+        """Observe the wall time spent inside the `with` block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labelvalues)
+
+    def _samples(self):
+        with self._lock:
+            series = sorted((key, (list(counts), total)) for key, (counts, total) in self._series.items())
+        lines = []
+        for key, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _number(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+registry = MetricsRegistry()
+
+stage_seconds = registry.register(Histogram(
+    "voice_analysis_stage_seconds",
+    "Time spent in each stage of a voice analysis.",
+    labelnames=("stage",),
+))
+
+analysis_seconds = registry.register(Histogram(
+    "voice_analysis_seconds",
+    "Total time of a voice analysis, by source (request or job).",
+    labelnames=("source",),
+))
+
+analysis_failures = registry.register(Counter(
+    "voice_analysis_failures_total",
+    "Failed voice analyses by source and exception type.",
+    labelnames=("source", "type"),
+))
+
+analyses_in_flight = registry.register(Gauge(
+    "voice_analyses_in_flight",
+    "Voice analyses currently being processed, by source.",
+    labelnames=("source",),
+))
+
+analysis_pool_pending = registry.register(Gauge(
+    "analysis_pool_pending",
+    "Jobs running or waiting in the analysis process pool.",
+    callback=lambda: analysis_pool.pending,
+))
+
+analysis_pool_capacity = registry.register(Gauge(
+    "analysis_pool_capacity",
+    "Jobs the analysis pool admits at once (workers plus queue depth).",
+    callback=lambda: analysis_pool.capacity,
+))
+
+decoder_pool_pending = registry.register(Gauge(
+    "decoder_pool_pending",
+    "Decodes of compressed uploads running or waiting in the decoder pool.",
+    callback=lambda: decoder_pool.pending,
+))
+
+decoder_pool_timeouts = registry.register(Counter(
+    "decoder_pool_timeouts_total",
+    "Decodes of compressed uploads killed after DECODER_TIMEOUT.",
+    callback=lambda: decoder_pool.timeouts,
+))
+
+decoder_pool_restarts = registry.register(Counter(
+    "decoder_pool_restarts_total",
+    "Decoder worker pools replaced after a worker crashed or was killed for a timeout.",
+    callback=lambda: decoder_pool.restarts,
+))
+
+startup_seconds = registry.register(Gauge(
+    "voice_api_startup_seconds",
+    "Seconds spent in each startup phase of this API process.",
+    labelnames=("phase",),
+))
+
+api_ready = registry.register(Gauge(
+    "voice_api_ready",
+    "1 once the startup warm-up has finished, else 0.",
+))
+
+
+@contextmanager
+def track_analysis(source, started_at=None):
+    """
+    Count an analysis as in flight, time it, and record its failure type if it raises.
+
+    `started_at` is a `time.perf_counter()` value to time from instead of
+    now, e.g. when the request arrived, before its body was read.
+    """
+    analyses_in_flight.inc(source)
+    start = time.perf_counter() if started_at is None else started_at
+    try:
+        yield
+    except Exception as e:
+        analysis_failures.inc(source, type(e).__name__)
+        raise
+    finally:
+        analyses_in_flight.dec(source)
+        analysis_seconds.observe(time.perf_counter() - start, source)
+
+
+def observe_stages(timings):
+    """Record stage durations (seconds) measured elsewhere, e.g. in a worker process."""
+    for stage, seconds in (timings or {}).items():
+        stage_seconds.observe(seconds, stage)
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from starlette.concurrency import run_in_threadpool
+from app.ml.model_predictor import model_registry
+from app.services.analysis_pool import analysis_pool
+from app.services.analysis_tasks import warm_up_worker
+from app.services.metrics import api_ready, startup_seconds
+from app.utils.voice_data_extraction import VOICE_FEATURES, get_extraction_params
+
+# Warm up the model and every analysis worker before reporting ready ('0' skips it)
+STARTUP_WARMUP = os.getenv('STARTUP_WARMUP', '1') != '0'
+
+# Warm-up attempts before giving up; /healthz then fails so the replica is restarted
+STARTUP_WARMUP_ATTEMPTS = max(1, int(os.getenv('STARTUP_WARMUP_ATTEMPTS', '5')))
+
+# Delay before the second attempt, doubled for each further one (capped at 60 s)
+STARTUP_WARMUP_BACKOFF = float(os.getenv('STARTUP_WARMUP_BACKOFF', '2'))
+
+# Patient fields sent with the synthetic warm-up recording
+WARMUP_PATIENT = {'age': 60, 'sex': 1, 'test_time': 0.0}
+
+
+class StartupState:
+    """
+    Readiness of this API process and how long each startup phase took.
+
+    Phases are recorded as they finish ('imports', 'model_load',
+    'worker_warmup', ...) and exported as voice_api_startup_seconds.
+    `ready` turns true once the warm-up has succeeded; until then /readyz
+    answers 503. A failed warm-up is retried with exponential backoff;
+    once every attempt failed, `failed` is set and /healthz answers 503
+    too, so the orchestrator replaces the replica instead of keeping an
+    unready process alive forever.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ready = False
+        self.failed = False
+        self.error = None
+        self.attempts = 0
+        self.timings = {}
+        api_ready.set(0)
+
+    def record_imports(self, started):
+        """Record the 'imports' phase, which began at `started` (a time.perf_counter() value)."""
+        self.started = started
+        self.record("imports", time.perf_counter() - started)
+
+    def record(self, phase, seconds):
+        self.timings[phase] = seconds
+        startup_seconds.set(seconds, phase)
+
+    def mark_ready(self):
+        self.ready = True
+        api_ready.set(1)
+
+    async def warm_up(self, enabled=STARTUP_WARMUP, attempts=STARTUP_WARMUP_ATTEMPTS,
+                      backoff=STARTUP_WARMUP_BACKOFF):
+        """
+        Preload the model here and warm up every analysis worker process.
+
+        Runs in the background after the server has started, so /healthz
+        answers while it is in progress. Failures (e.g. the model files
+        are not mounted yet) are retried up to `attempts` times, waiting
+        `backoff` seconds before the second attempt and twice as long
+        before each further one.
+        """
+        delay = backoff
+        while not self.ready:
+            self.attempts += 1
+            try:
+                if enabled:
+                    start = time.perf_counter()
+                    bundle = await run_in_threadpool(model_registry.get)
+                    self.record("model_load", time.perf_counter() - start)
+
+                    await self._warm_up_workers(bundle.feature_names)
+                self.error = None
+                self.mark_ready()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.error = f"{type(e).__name__}: {e}"
+                if self.attempts >= attempts:
+                    self.failed = True
+                    print(f"Startup warm-up failed {self.attempts} times, giving up: {self.error}")
+                    break
+                print(f"Startup warm-up attempt {self.attempts} failed, retrying in {delay:g} s: "
+                      f"{self.error}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60.0)
+
+        self.record("ready", time.perf_counter() - self.started)
+        self.report()
+
+    async def _warm_up_workers(self, feature_names):
+        params = get_extraction_params(feature_names)
+        basic_features = {name: WARMUP_PATIENT.get(name, 0.0)
+                          for name in feature_names if name not in VOICE_FEATURES}
+
+        # One task per worker; the pool spawns a new process for each task
+        # submitted while the others are busy.
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            analysis_pool.run(warm_up_worker, params, basic_features)
+            for _ in range(analysis_pool.workers)
+        ))
+        wall = time.perf_counter() - start
+        self.record("worker_warmup", wall)
+
+        # Slowest worker per phase; whatever the slowest worker did not spend
+        # in a phase went to spawning the process and importing the modules.
+        for phase in results[0]["timings"]:
+            self.record(f"worker_{phase}", max(result["timings"][phase] for result in results))
+        slowest = max(sum(result["timings"].values()) for result in results)
+        self.record("worker_spawn", max(0.0, wall - slowest))
+        print(f"Warmed up {len({result['pid'] for result in results})} analysis worker processes")
+
+    def report(self):
+        print("STARTUP TIMINGS:")
+        for phase, seconds in self.timings.items():
+            print(f"  {phase:<24} {seconds * 1000:10.1f} ms")
+        print(f"  {'status':<24} {'ready' if self.ready else 'not ready'}"
+              f" after {self.attempts} attempt(s)")
+
+
+startup = StartupState()
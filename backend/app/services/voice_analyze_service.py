@@ -1,17 +1,34 @@
-import tempfile
-from app.utils.file_handler import save_temp_file
-from app.ml.model_predictor import predict_parkinson
-from app.utils.voice_data_extraction import extract_voice_features
+import time
+from starlette.concurrency import run_in_threadpool
+from app.utils.file_handler import get_audio_suffix, read_upload, check_wav_duration, detect_audio_format
+from app.utils.voice_data_extraction import get_extraction_params
+from app.ml.model_predictor import get_required_features
+from app.services.analysis_pool import analysis_pool
+from app.services.analysis_tasks import extract_features_from_bytes, predict_from_features
+from app.services.decoder_pool import decoder_pool
+from app.services.feature_cache import feature_cache, upload_digest
+from app.services.metrics import observe_stages
 
-async def process_audio_and_predict(audio_file, basic_info):
+async def process_audio_and_predict(audio_file, basic_info, received_at=None):
     print("PROCESSING IN SERVICE:")
     print(f"Received basic_info: {basic_info}")
     print(f"Audio file object: {type(audio_file)}")
 
-    temp_file_path = await save_temp_file(audio_file)
+    # Audio is decoded in memory by the worker; no temp files are written.
+    # The upload is read in chunks and rejected once it exceeds the size limit.
+    # The 'upload' stage runs from the arrival of the request (`received_at`,
+    # stamped by BodySizeLimitMiddleware), so it includes receiving and
+    # spooling the multipart body, not only reading it back.
+    start = received_at if received_at is not None else time.perf_counter()
+    content = await read_upload(audio_file)
+    suffix = get_audio_suffix(audio_file, content)
+    check_wav_duration(content)
+    observe_stages({"upload": time.perf_counter() - start})
 
-    voice_features = extract_voice_features(temp_file_path)   
-    
+    return await analyze_audio_content(content, suffix, basic_info)
+
+async def analyze_audio_content(content, suffix, basic_info):
+    """Run the analysis on already received audio bytes (used by the job workers too)."""
     patient_name = basic_info['name']
 
     # exclude name 
@@ -21,14 +38,63 @@ async def process_audio_and_predict(audio_file, basic_info):
     if 'sex' in prediction_features:
         original_sex = prediction_features['sex']
         prediction_features['sex'] = 1 if prediction_features['sex'].lower() == 'male' else 0
-    
+
+    # Feature extraction and inference are CPU-bound; run them in a worker
+    # process so the event loop keeps serving other requests. Repeated
+    # uploads are answered from the feature cache and go straight to the model.
+    # Only the voice features the loaded model consumes are extracted.
+    required_features = await run_in_threadpool(get_required_features)
+    params = get_extraction_params(required_features)
+
+    async def compute():
+        audio, audio_suffix = await decode_upload(content, suffix)
+        return await run_timed(extract_features_from_bytes, audio, audio_suffix, params)
+
+    voice_features = await feature_cache.get_or_compute(upload_digest(content, suffix, params), compute)
+
+    # Reports of the extraction are cached along with the features: the
+    # voice activity trimming and, in segmented mode, every window
+    reports = {key: voice_features.pop(key) for key in ('voice_activity', 'windows')
+               if key in voice_features}
     feature_data = {**prediction_features, **voice_features}
 
-    
     print("CALLING ML MODEL...")
-    prediction = predict_parkinson(feature_data)
+    prediction = (await run_timed(predict_from_features, feature_data))["prediction"]
 
     final_result = {"prediction": prediction, "patient": patient_name}
     print(f"FINAL RESULT: {final_result}")
+    final_result.update(reports)
 
     return final_result
+
+async def decode_upload(content, suffix):
+    """
+    Hand WAV uploads to the workers as they are; decode compressed ones in the decoder pool first.
+
+    Returns:
+    --------
+    tuple : (audio bytes, suffix) where compressed uploads became WAV files
+            of 32-bit float samples
+    """
+    suffix = detect_audio_format(content) or suffix
+    if suffix == ".wav":
+        return content, suffix
+    start = time.perf_counter()
+    audio = await decoder_pool.decode(content, suffix)
+    observe_stages({"decode": time.perf_counter() - start})
+    return audio, ".wav"
+
+async def run_timed(fn, *args):
+    """
+    Run a task from analysis_tasks in the pool and record its stage timings.
+
+    The task reports the seconds it spent per stage; whatever remains of the
+    wall time seen here was spent waiting for a free worker or moving data to
+    and from it, and is recorded as the 'pool_wait' stage.
+    """
+    start = time.perf_counter()
+    result = await analysis_pool.run(fn, *args)
+    timings = result["timings"]
+    observe_stages(timings)
+    observe_stages({"pool_wait": max(0.0, time.perf_counter() - start - sum(timings.values()))})
+    return result
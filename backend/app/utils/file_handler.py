@@ -1,14 +1,135 @@
+import io
+import struct
+import subprocess
 import tempfile
 import shutil
+import time
 import os
-from pydub import AudioSegment
+from contextlib import contextmanager
+import numpy as np
+try:
+    import av
+except ImportError:  # compressed uploads are then decoded by the ffmpeg executable
+    av = None
 
-async def save_temp_file(upload_file):
-    # Get the original file extension from content type or filename
-    content_type = upload_file.content_type
-    filename = upload_file.filename
+# Largest accepted audio upload
+MAX_UPLOAD_MB = float(os.getenv('MAX_UPLOAD_MB', '25'))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+
+# Longest accepted recording, in seconds
+MAX_AUDIO_SECONDS = float(os.getenv('MAX_AUDIO_SECONDS', '300'))
+
+# Uploads are read and written in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# ffmpeg executable that decodes compressed formats when PyAV is not installed
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+
+# Containers ffmpeg decodes from a pipe; the others (MP4 / M4A, whose index
+# may sit at the end of the file) are decoded from a temporary file
+STREAMABLE_FORMATS = ('.ogg', '.webm', '.mp3', '.flac', '.aac', '.aiff')
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds MAX_UPLOAD_BYTES."""
+
+class AudioTooLongError(Exception):
+    """Raised when a recording is longer than MAX_AUDIO_SECONDS."""
+
+class DecodeTimeoutError(Exception):
+    """Raised when decoding an upload takes longer than its timeout."""
+
+class DecoderUnavailableError(Exception):
+    """Raised for compressed uploads when neither PyAV nor the ffmpeg executable is installed."""
+
+class UnsupportedWavError(Exception):
+    """Raised for files the native WAV parser cannot read (not RIFF WAV, or e.g. ADPCM / mu-law)."""
+
+# WAVE format tags read by the native parser
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+async def iter_upload_chunks(upload_file, max_bytes=MAX_UPLOAD_BYTES):
+    """Yield the upload in fixed-size chunks, failing as soon as it grows past `max_bytes`."""
+    received = 0
+    while True:
+        chunk = await upload_file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        received += len(chunk)
+        if received > max_bytes:
+            raise UploadTooLargeError(
+                f"Audio file is larger than the {max_bytes // (1024 * 1024)} MB limit"
+            )
+        yield chunk
+
+async def read_upload(upload_file, max_bytes=MAX_UPLOAD_BYTES):
+    """Read an upload into memory chunk by chunk, holding at most `max_bytes`."""
+    buffer = bytearray()
+    async for chunk in iter_upload_chunks(upload_file, max_bytes):
+        buffer += chunk
+    return bytes(buffer)
+
+async def measure_upload(upload_file, max_bytes=MAX_UPLOAD_BYTES):
+    """Return the size of an upload without buffering it."""
+    size = 0
+    async for chunk in iter_upload_chunks(upload_file, max_bytes):
+        size += len(chunk)
+    return size
+
+def check_wav_duration(content, max_seconds=MAX_AUDIO_SECONDS):
+    """Reject WAV files that are too long using only their header."""
+    try:
+        header = read_wav_header(content)
+    except UnsupportedWavError:
+        return  # not a WAV the native parser reads; the decoder checks the duration instead
+    duration = header['frames'] / float(header['sample_rate'])
+    if duration > max_seconds:
+        raise AudioTooLongError(
+            f"Recording is {duration:.0f} s long; the limit is {max_seconds:.0f} s"
+        )
+
+def detect_audio_format(content):
+    """
+    Container extension ('.wav', '.ogg', ...) from the leading magic bytes.
+
+    Returns None when the bytes match none of the known containers.
+    """
+    head = bytes(content[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+        return ".wav"
+    if head[:4] == b'OggS':
+        return ".ogg"
+    if head[:4] == b'\x1aE\xdf\xa3':  # EBML header of WebM / Matroska
+        return ".webm"
+    if head[:4] == b'fLaC':
+        return ".flac"
+    if head[4:8] == b'ftyp':
+        return ".m4a"
+    if head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'):
+        return ".aiff"
+    if head[:3] == b'ID3':
+        return ".mp3"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # MPEG audio frame sync; layer bits 00 mark an ADTS AAC stream
+        return ".mp3" if head[1] & 0x06 else ".aac"
+    return None
+
+def get_audio_suffix(upload_file, content=None):
+    """
+    Audio container extension of an upload.
+
+    The magic bytes of `content` decide when they are recognized, since
+    clients often send a wrong content type or file name; otherwise the
+    extension is guessed from the content type or file name.
+    """
+    detected = detect_audio_format(content) if content else None
+    if detected is not None:
+        return detected
+
+    content_type = upload_file.content_type or ""
+    filename = upload_file.filename or ""
     
-    # Determine file extension
     if 'webm' in content_type or filename.endswith('.webm'):
         original_suffix = ".webm"
     elif 'ogg' in content_type or filename.endswith('.ogg'):
@@ -20,23 +141,375 @@ async def save_temp_file(upload_file):
     else:
         original_suffix = ".wav"  # default
     
-    # Save original file first
+    return original_suffix
+
+def decode_audio_bytes(content, suffix):
+    """
+    Decode an uploaded audio file in memory.
+    
+    Parameters:
+    -----------
+    content : bytes
+        Raw bytes of the uploaded file.
+    suffix : str
+        Container extension as returned by `get_audio_suffix`.
+    
+    Returns:
+    --------
+    tuple : (samples, sample_rate) where samples is a float64 array of
+            shape (channels, n_samples) scaled to [-1, 1]
+
+    The container is taken from the magic bytes, `suffix` is only a fallback
+    for unrecognized files. WAV is parsed natively with NumPy; compressed
+    formats go through `decode_compressed` (the API decodes them beforehand
+    in the `decoder_pool` instead, so its workers only see WAV).
+    """
+    suffix = detect_audio_format(content) or suffix
+    if suffix == ".wav":
+        try:
+            return decode_wav(content)
+        except UnsupportedWavError:
+            # e.g. ADPCM or mu-law WAV, which Praat reads
+            return _decode_with_praat(content, suffix)
+    return decode_wav(decode_compressed(content, suffix))
+
+def compressed_decoder():
+    """Name of the decoder used for compressed formats: 'pyav', 'ffmpeg' or None."""
+    if av is not None:
+        return "pyav"
+    if shutil.which(FFMPEG_BINARY) is not None:
+        return "ffmpeg"
+    return None
+
+def decode_compressed(content, suffix, timeout=None):
+    """
+    Decode a compressed upload in-process with PyAV, or with ffmpeg without it.
+
+    Returns:
+    --------
+    bytes : WAV file of 32-bit float samples, see `ffmpeg_decode_command`
+    """
+    if av is not None:
+        return decode_with_pyav(content, timeout)
+    return decode_with_ffmpeg(content, suffix, timeout)
+
+def decode_with_pyav(content, timeout=None):
+    """
+    Decode the first audio stream of a compressed upload with PyAV.
+
+    PyAV runs the FFmpeg decoders in this process, so no process is started
+    per upload. The output matches `decode_with_ffmpeg`: the decoder's float
+    samples at the original rate and channel count, interleaved into a WAV
+    file of 32-bit floats, cut just past the duration limit. The timeout is
+    checked between decoded frames.
+
+    Returns:
+    --------
+    bytes : WAV file of 32-bit float samples
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    chunks = []
+    sample_rate = channels = None
+    n_frames = 0
+    try:
+        with av.open(io.BytesIO(content), mode="r") as container:
+            if not container.streams.audio:
+                raise Exception("Failed to decode audio file: no audio stream")
+            # Packed float32: the decoders' native sample type, interleaved
+            resampler = av.AudioResampler(format="flt")
+            for decoded in container.decode(container.streams.audio[0]):
+                for frame in resampler.resample(decoded):
+                    if sample_rate is None:
+                        sample_rate, channels = frame.sample_rate, len(frame.layout.channels)
+                        max_frames = int((MAX_AUDIO_SECONDS + 1) * sample_rate)
+                    chunks.append(frame.to_ndarray().reshape(-1))
+                    n_frames += frame.samples
+                if sample_rate is not None and n_frames > max_frames:
+                    break
+                if deadline is not None and time.monotonic() > deadline:
+                    raise DecodeTimeoutError(f"Decoding took longer than {timeout:g} s")
+    except av.FFmpegError as e:
+        raise Exception(f"Failed to decode audio file: {e}")
+    if sample_rate is None:
+        raise Exception("Failed to decode audio file: no audio samples")
+
+    samples = np.concatenate(chunks)[:max_frames * channels]
+    return float_wav_bytes(samples, sample_rate, channels)
+
+def float_wav_bytes(samples, sample_rate, channels):
+    """WAV file of interleaved 32-bit float `samples`, readable by `decode_wav`."""
+    data = np.asarray(samples, dtype="<f4").tobytes()
+    fmt = struct.pack("<HHIIHH", WAVE_FORMAT_IEEE_FLOAT, channels, sample_rate,
+                      sample_rate * channels * 4, channels * 4, 32)
+    return (b"RIFF" + struct.pack("<I", 4 + 8 + len(fmt) + 8 + len(data)) + b"WAVE"
+            + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+            + b"data" + struct.pack("<I", len(data)) + data)
+
+def ffmpeg_decode_command(input_path="pipe:0"):
+    """
+    ffmpeg command that decodes the first audio stream of `input_path` to stdout.
+
+    The samples are written as 32-bit float PCM, the native output of the
+    Opus, Vorbis, MP3 and AAC decoders, so they are not converted or
+    re-encoded; a minimal WAV header in front carries the sample rate and
+    channel count for `decode_wav`. Output stops just past the duration
+    limit.
+    """
+    return [
+        FFMPEG_BINARY, "-hide_banner", "-loglevel", "error",
+        "-i", input_path, "-map", "0:a:0", "-t", f"{MAX_AUDIO_SECONDS + 1:g}",
+        "-map_metadata", "-1", "-fflags", "+bitexact", "-flags:a", "+bitexact",
+        "-c:a", "pcm_f32le", "-f", "wav", "pipe:1",
+    ]
+
+@contextmanager
+def ffmpeg_input(content, suffix):
+    """Input path for `ffmpeg_decode_command`: stdin for STREAMABLE_FORMATS, else a temporary file."""
+    if suffix in STREAMABLE_FORMATS:
+        yield "pipe:0"
+        return
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(content)
+        path = tmp.name
+    try:
+        yield path
+    finally:
+        os.remove(path)
+
+def decode_with_ffmpeg(content, suffix, timeout=None):
+    """
+    Decode a compressed upload with a fresh ffmpeg process.
+
+    Returns:
+    --------
+    bytes : WAV file of 32-bit float samples, see `ffmpeg_decode_command`
+    """
+    with ffmpeg_input(content, suffix) as input_path:
+        try:
+            result = subprocess.run(ffmpeg_decode_command(input_path), capture_output=True, timeout=timeout,
+                                    input=content if input_path == "pipe:0" else None)
+        except FileNotFoundError:
+            raise DecoderUnavailableError(f"Cannot decode compressed audio: {FFMPEG_BINARY} is not installed")
+        except subprocess.TimeoutExpired:
+            raise DecodeTimeoutError(f"Decoding took longer than {timeout:g} s")
+    check_ffmpeg_result(result.returncode, result.stderr)
+    return result.stdout
+
+def check_ffmpeg_result(returncode, stderr):
+    if returncode != 0:
+        message = stderr.decode(errors="replace").strip().splitlines()
+        raise Exception(f"Failed to decode audio file: {message[-1] if message else f'ffmpeg exited with {returncode}'}")
+
+def read_wav_header(content):
+    """
+    Parse the chunks of a little-endian RIFF WAV file up to its sample data.
+
+    Handles PCM (8, 16, 24, 32 bit), IEEE float (32, 64 bit) and their
+    WAVE_FORMAT_EXTENSIBLE variants. A data chunk whose size is 0 or larger
+    than the file (left by writers that stream the file) extends to the end
+    of the received bytes.
+
+    Returns:
+    --------
+    dict : {'encoding': 'pcm' or 'float', 'channels', 'sample_rate',
+            'sample_width' (bytes per sample), 'data_offset', 'frames'}
+    """
+    if len(content) < 12 or content[:4] != b'RIFF' or content[8:12] != b'WAVE':
+        raise UnsupportedWavError("Not a RIFF WAV file")
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(content):
+        chunk_id = bytes(content[offset:offset + 4])
+        size, = struct.unpack_from('<I', content, offset + 4)
+        body = offset + 8
+        if chunk_id == b'fmt ':
+            fmt = _parse_fmt_chunk(bytes(content[body:body + size]))
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise UnsupportedWavError("WAV data chunk comes before the fmt chunk")
+            available = len(content) - body
+            if size == 0 or size > available:
+                size = available
+            frame_size = fmt['channels'] * fmt['sample_width']
+            return {**fmt, 'data_offset': body, 'frames': size // frame_size}
+        # Chunks are padded to an even size
+        offset = body + size + (size & 1)
+    raise UnsupportedWavError("WAV file has no data chunk")
+
+def _parse_fmt_chunk(chunk):
+    if len(chunk) < 16:
+        raise UnsupportedWavError("WAV fmt chunk is too short")
+    tag, channels, sample_rate, _, block_align, bits = struct.unpack_from('<HHIIHH', chunk)
+    if tag == WAVE_FORMAT_EXTENSIBLE:
+        if len(chunk) < 26:
+            raise UnsupportedWavError("WAV extensible fmt chunk is too short")
+        # The sub-format GUID starts with the actual format tag
+        tag, = struct.unpack_from('<H', chunk, 24)
+
+    if tag == WAVE_FORMAT_PCM and bits in (8, 16, 24, 32):
+        encoding = 'pcm'
+    elif tag == WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        encoding = 'float'
+    else:
+        raise UnsupportedWavError(f"Unsupported WAV encoding: format tag {tag:#06x}, {bits} bit")
+    if channels == 0 or sample_rate == 0 or block_align != channels * (bits // 8):
+        raise UnsupportedWavError("Inconsistent WAV fmt chunk")
+    return {'encoding': encoding, 'channels': channels, 'sample_rate': sample_rate,
+            'sample_width': bits // 8}
+
+def read_wav_frames(content, header, start=0, count=None):
+    """
+    Decode frames [start, start + count) of a WAV file described by `header`.
+
+    Returns:
+    --------
+    numpy.ndarray : float64, shape (channels, n), PCM scaled to [-1, 1]
+    """
+    frame_size = header['channels'] * header['sample_width']
+    end = header['frames'] if count is None else min(header['frames'], start + count)
+    begin = header['data_offset'] + start * frame_size
+    frames = memoryview(content)[begin:header['data_offset'] + max(end, start) * frame_size]
+    if header['encoding'] == 'float':
+        samples = np.frombuffer(frames, dtype=f"<f{header['sample_width']}").astype(np.float64)
+        return samples.reshape(-1, header['channels']).T
+    return _pcm_to_float(frames, header['sample_width'], header['channels'])
+
+def decode_wav(content, max_seconds=MAX_AUDIO_SECONDS):
+    """
+    Decode a RIFF WAV file with NumPy, without pydub or a subprocess.
+
+    Returns:
+    --------
+    tuple : (samples, sample_rate) like `decode_audio_bytes`
+    """
+    header = read_wav_header(content)
+    if header['frames'] / float(header['sample_rate']) > max_seconds:
+        raise AudioTooLongError(f"Recording is longer than the {max_seconds:.0f} s limit")
+    return read_wav_frames(content, header), header['sample_rate']
+
+def iter_audio_windows(content, suffix, window_seconds, hop_seconds):
+    """
+    Yield an uploaded recording as fixed-length windows, `hop_seconds` apart.
+
+    WAV files are read window by window straight from the upload bytes,
+    so at most one window of decoded samples is held at a time. Other
+    formats are decoded once and then sliced.
+
+    Parameters:
+    -----------
+    content : bytes
+        Raw bytes of the uploaded file.
+    suffix : str
+        Container extension as returned by `get_audio_suffix`.
+    window_seconds : float
+        Length of each window; the last one ends at the end of the recording
+        and may be shorter.
+    hop_seconds : float
+        Distance between the starts of consecutive windows. Windows overlap
+        by `window_seconds - hop_seconds`.
+
+    Yields:
+    -------
+    tuple : (start_seconds, samples, sample_rate) with samples shaped like
+            those of `decode_audio_bytes`
+    """
+    if hop_seconds <= 0 or hop_seconds > window_seconds:
+        raise ValueError("hop_seconds must be in (0, window_seconds]")
+
+    try:
+        header = read_wav_header(content)
+    except UnsupportedWavError:
+        header = None
+
+    if header is None:
+        samples, sample_rate = decode_audio_bytes(content, suffix)
+        total = samples.shape[1]
+        read = lambda start, count: samples[:, start:start + count]
+    else:
+        sample_rate = header['sample_rate']
+        total = header['frames']
+        if total / float(sample_rate) > MAX_AUDIO_SECONDS:
+            raise AudioTooLongError(f"Recording is longer than the {MAX_AUDIO_SECONDS:.0f} s limit")
+        read = lambda start, count: read_wav_frames(content, header, start, count)
+
+    window = max(1, int(round(window_seconds * sample_rate)))
+    hop = max(1, int(round(hop_seconds * sample_rate)))
+    start = 0
+    while True:
+        yield start / float(sample_rate), read(start, window), sample_rate
+        if start + window >= total:
+            break
+        start += hop
+
+def _pcm_to_float(frames, sample_width, channels):
+    """Convert interleaved little-endian PCM frames to a (channels, n) float64 array in [-1, 1]."""
+    # 8-bit WAV is unsigned, wider samples are signed
+    if sample_width == 1:
+        samples = np.frombuffer(frames, dtype=np.uint8).astype(np.float64) - 128.0
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        padded = np.zeros((len(raw), 4), dtype=np.uint8)
+        padded[:, 1:] = raw
+        samples = padded.view('<i4').ravel().astype(np.float64) / 256.0
+    else:
+        samples = np.frombuffer(frames, dtype=f'<i{sample_width}').astype(np.float64)
+    full_scale = float(1 << (8 * sample_width - 1))
+    return (samples / full_scale).reshape(-1, channels).T
+
+def _decode_with_praat(content, suffix):
+    import parselmouth
+    
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
+        tmp.write(content)
+        path = tmp.name
+    try:
+        sound = parselmouth.Sound(path)
+        if sound.duration > MAX_AUDIO_SECONDS:
+            raise AudioTooLongError(f"Recording is longer than the {MAX_AUDIO_SECONDS:.0f} s limit")
+        return sound.values, sound.sampling_frequency
+    finally:
+        os.remove(path)
+
+async def save_temp_file(upload_file):
+    original_suffix = get_audio_suffix(upload_file)
+    
+    # Save original file first, streaming it to disk in chunks; the magic
+    # bytes of the first chunk override the guessed format
+    audio_format = None
     with tempfile.NamedTemporaryFile(delete=False, suffix=original_suffix) as tmp_original:
-        content = await upload_file.read()
-        tmp_original.write(content)
         original_path = tmp_original.name
+        try:
+            async for chunk in iter_upload_chunks(upload_file):
+                if audio_format is None:
+                    audio_format = detect_audio_format(chunk) or original_suffix
+                tmp_original.write(chunk)
+        except UploadTooLargeError:
+            tmp_original.close()
+            os.remove(original_path)
+            raise
+    
+    audio_format = audio_format or original_suffix
     
     # If already WAV, return as is
-    if original_suffix == ".wav":
+    if audio_format == ".wav":
         return original_path
     
-    # Convert to WAV using pydub
+    # Decode to a WAV file of float samples with a single ffmpeg run. The
+    # output gets its own name: an upload labelled .wav that is really
+    # compressed was saved with a .wav suffix, so a name derived from the
+    # original could be the original itself.
+    fd, wav_path = tempfile.mkstemp(suffix=".wav")
     try:
-        audio = AudioSegment.from_file(original_path)
-        
-        # Create WAV file
-        wav_path = original_path.replace(original_suffix, ".wav")
-        audio.export(wav_path, format="wav")
+        with os.fdopen(fd, "wb") as wav_file:
+            try:
+                result = subprocess.run(ffmpeg_decode_command(original_path), stdout=wav_file,
+                                        stderr=subprocess.PIPE)
+            except FileNotFoundError:
+                raise DecoderUnavailableError(f"Cannot decode compressed audio: {FFMPEG_BINARY} is not installed")
+        if result.returncode != 0:
+            os.remove(wav_path)
+            check_ffmpeg_result(result.returncode, result.stderr)
         
         # Delete original file
         os.remove(original_path)
@@ -46,6 +519,9 @@ async def save_temp_file(upload_file):
         # If conversion fails, try to use original
         print(f"Audio conversion error: {e}")
         # Cleanup
-        if os.path.exists(original_path):
-            os.remove(original_path)
+        for path in (original_path, wav_path):
+            if os.path.exists(path):
+                os.remove(path)
+        if isinstance(e, DecoderUnavailableError):
+            raise
         raise Exception(f"Failed to convert audio file: {e}")
\ No newline at end of file
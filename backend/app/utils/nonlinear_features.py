@@ -0,0 +1,110 @@
+import numpy as np
+from scipy.stats import entropy
+
+
+def pitch_period_entropy(periods):
+    """
+    Pitch Period Entropy (PPE): entropy of the density histogram of the periods.
+
+    Uses min(20, len(periods) // 5) bins and ignores empty bins.
+    """
+    periods = np.asarray(periods, dtype=float)
+    hist, _ = np.histogram(periods, bins=min(20, len(periods)//5), density=True)
+    hist = hist[hist > 0]
+    return float(entropy(hist + 1e-10))
+
+
+def detrended_fluctuation_analysis(periods, num_scales=8):
+    """
+    Detrended Fluctuation Analysis (DFA) scaling exponent of a pitch period series.
+
+    For every scale `s` the integrated series is cut into non-overlapping
+    segments of length `s`, laid out as a (segments x s) matrix, and each
+    row is detrended with a closed-form least-squares line in one batched
+    operation instead of one `np.polyfit` call per segment.
+
+    Parameters:
+    -----------
+    periods : array-like
+        Pitch periods (seconds) of the voiced frames.
+    num_scales : int
+        Number of log-spaced scales between 4 and len(periods) / 4.
+
+    Returns:
+    --------
+    float : slope of log(F) against log(s), or NaN if fewer than two scales
+    """
+    periods = np.asarray(periods, dtype=float)
+    y = np.cumsum(periods - np.mean(periods))
+    n = len(y)
+    if n < 12:
+        return np.nan
+
+    scales = np.logspace(np.log10(4), np.log10(n / 4), num_scales, dtype=int)
+    log_F = []
+    log_s = []
+    for s in scales:
+        if s > n // 4 or s < 3:
+            continue
+        num_seg = n // s
+        segments = y[:num_seg * s].reshape(num_seg, s)
+
+        # Least-squares line per row: slope = cov(x, seg) / var(x)
+        x = np.arange(s, dtype=float)
+        x_centered = x - x.mean()
+        seg_mean = segments.mean(axis=1, keepdims=True)
+        slope = (segments - seg_mean) @ x_centered / np.dot(x_centered, x_centered)
+        detrended = segments - seg_mean - slope[:, None] * x_centered
+
+        rms = np.sqrt(np.mean(detrended ** 2, axis=1))
+        F = np.sqrt(np.mean(rms))
+        log_F.append(np.log(F))
+        log_s.append(np.log(s))
+
+    if len(log_F) > 1:
+        slope, _ = np.polyfit(log_s, log_F, 1)
+        return float(slope)
+    return np.nan
+
+
+def recurrence_period_density_entropy(periods, threshold_factor=0.1):
+    """
+    Simplified Recurrence Period Density Entropy (RPDE) of a pitch period series.
+
+    Two frames recur when their periods differ by less than
+    `threshold_factor * std(diff(periods))`. The statistic is the entropy of
+    the two-bin histogram of the n x n recurrence matrix (diagonal excluded).
+    Recurrent pairs are counted on the sorted periods with a binary search,
+    so time is O(n log n) and memory O(n); the matrix is never built.
+
+    Parameters:
+    -----------
+    periods : array-like
+        Pitch periods (seconds) of the voiced frames.
+    threshold_factor : float
+        Recurrence threshold as a fraction of the std of period differences.
+
+    Returns:
+    --------
+    float : RPDE value, or NaN for an empty series
+    """
+    periods = np.asarray(periods, dtype=float)
+    n = len(periods)
+    if n == 0:
+        return np.nan
+
+    diffs = np.abs(np.diff(periods))
+    rec_threshold = np.std(diffs) * threshold_factor if n > 1 else 0.0
+
+    # For each sorted period, count the later periods within the threshold;
+    # every such pair is one recurrence above the diagonal.
+    recurrent = 0
+    if rec_threshold > 0:
+        sorted_periods = np.sort(periods)
+        upper = np.searchsorted(sorted_periods, sorted_periods + rec_threshold, side='left')
+        recurrent = 2 * int(np.maximum(upper - np.arange(1, n + 1), 0).sum())
+
+    # Density of a 2-bin histogram over the {0, 1} matrix entries
+    total = n * n
+    hist_rpde = np.array([2.0 * (total - recurrent) / total, 2.0 * recurrent / total])
+    return float(entropy(hist_rpde + 1e-10))
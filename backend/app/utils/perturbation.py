@@ -0,0 +1,218 @@
+import numpy as np
+
+# Pulses processed per block when measuring peak amplitudes, to bound memory
+_AMPLITUDE_BLOCK = 4096
+
+
+def jitter_measures(pulse_times, period_floor, period_ceiling, max_period_factor):
+    """
+    Praat's five jitter measures from the pulse times of a PointProcess.
+
+    Follows Praat's rules for whole-signal measurements: a run of
+    consecutive periods only counts when every period lies within
+    [period_floor, period_ceiling] and neighbouring periods differ by at
+    most `max_period_factor`; relative measures divide by the mean period
+    of the valid periods.
+
+    Returns:
+    --------
+    dict : 'local', 'local, absolute', 'rap', 'ppq5', 'ddp' (NaN where Praat
+           would report an undefined value)
+    """
+    t = np.asarray(pulse_times, dtype=np.float64)
+    periods = np.diff(t)
+    n_periods = len(periods)
+    nan = float('nan')
+    result = {'local': nan, 'local, absolute': nan, 'rap': nan, 'ppq5': nan, 'ddp': nan}
+    if n_periods < 2:
+        return result
+
+    in_range = (periods >= period_floor) & (periods <= period_ceiling)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factors = np.maximum(periods[1:] / periods[:-1], periods[:-1] / periods[1:])
+    # pair_ok[k]: periods k and k + 1 are both valid and close enough
+    pair_ok = in_range[:-1] & in_range[1:] & (factors <= max_period_factor)
+
+    mean_period = _mean_period(periods, in_range, max_period_factor)
+
+    # Local (absolute): mean |p[k+1] - p[k]| over valid pairs
+    valid_pairs = int(pair_ok.sum())
+    if valid_pairs >= 1:
+        absolute = np.abs(np.diff(periods))[pair_ok].sum() / valid_pairs
+        result['local, absolute'] = float(absolute)
+        result['local'] = float(absolute / mean_period)
+
+    # RAP: 3-period moving average around the middle period
+    rap = _relative_perturbation(periods, pair_ok, 3)
+    if rap is not None:
+        result['rap'] = float(rap / mean_period)
+        result['ddp'] = 3.0 * result['rap']
+
+    # PPQ5: 5-period moving average around the middle period
+    ppq5 = _relative_perturbation(periods, pair_ok, 5)
+    if ppq5 is not None:
+        result['ppq5'] = float(ppq5 / mean_period)
+
+    return result
+
+
+def shimmer_measures(amplitude_times, amplitudes, period_floor, period_ceiling,
+                     max_amplitude_factor):
+    """
+    Praat's six shimmer measures from the peak amplitudes of an AmplitudeTier.
+
+    `amplitude_times` / `amplitudes` are the points produced by
+    `peak_amplitudes`. Consecutive peaks count when the time between them
+    lies within [period_floor, period_ceiling] and their ratio is at most
+    `max_amplitude_factor`; relative measures divide by the mean amplitude
+    of all peaks but the last, as Praat does.
+
+    Returns:
+    --------
+    dict : 'local', 'local_dB', 'apq3', 'apq5', 'apq11', 'dda'
+    """
+    t = np.asarray(amplitude_times, dtype=np.float64)
+    a = np.asarray(amplitudes, dtype=np.float64)
+    nan = float('nan')
+    result = {'local': nan, 'local_dB': nan, 'apq3': nan, 'apq5': nan, 'apq11': nan, 'dda': nan}
+    if len(a) < 2:
+        return result
+
+    gaps = np.diff(t)
+    gap_ok = (gaps >= period_floor) & (gaps <= period_ceiling)
+    ratios = np.maximum(a[1:] / a[:-1], a[:-1] / a[1:])
+    ratio_ok = ratios <= max_amplitude_factor
+    mean_amplitude = a[:-1].mean()
+
+    # Local and local dB: consecutive peaks
+    pair_ok = gap_ok & ratio_ok
+    valid_pairs = int(pair_ok.sum())
+    if valid_pairs >= 1 and mean_amplitude != 0.0:
+        result['local'] = float(np.abs(np.diff(a))[pair_ok].sum() / valid_pairs / mean_amplitude)
+        result['local_dB'] = float(np.abs(20.0 * np.log10(a[1:] / a[:-1]))[pair_ok].sum() / valid_pairs)
+
+    # APQn: n-point moving average around the middle peak
+    for name, window in (('apq3', 3), ('apq5', 5), ('apq11', 11)):
+        value = _amplitude_perturbation(a, gap_ok, ratio_ok, window)
+        if value is not None and mean_amplitude != 0.0:
+            result[name] = float(value / mean_amplitude)
+    if not np.isnan(result['apq3']):
+        result['dda'] = 3.0 * result['apq3']
+
+    return result
+
+
+def peak_amplitudes(pulse_times, samples, x1, dx, period_floor, period_ceiling,
+                    max_period_factor):
+    """
+    Peak amplitude at every valid pulse, as Praat's "To AmplitudeTier (period)".
+
+    For each interior pulse whose neighbouring periods p1, p2 are valid, the
+    amplitude is the Hann-windowed RMS of the signal from 0.2 * p1 before
+    to 0.2 * p2 after the pulse (channels are averaged).
+
+    Returns:
+    --------
+    tuple : (times, amplitudes) of the pulses with a positive amplitude
+    """
+    t = np.asarray(pulse_times, dtype=np.float64)
+    if len(t) < 3:
+        return np.empty(0), np.empty(0)
+
+    signal = np.asarray(samples, dtype=np.float64)
+    if signal.ndim == 2:
+        signal = signal[0] if signal.shape[0] == 1 else signal.mean(axis=0)
+    n_samples = len(signal)
+
+    p1 = t[1:-1] - t[:-2]
+    p2 = t[2:] - t[1:-1]
+    factors = np.maximum(p1 / p2, p2 / p1)
+    ok = ((p1 >= period_floor) & (p1 <= period_ceiling) &
+          (p2 >= period_floor) & (p2 <= period_ceiling) &
+          (factors <= max_period_factor))
+    centers = t[1:-1][ok]
+    width_left = 0.2 * p1[ok]
+    width_right = 0.2 * p2[ok]
+
+    # Sample window [ceil((tmin - x1) / dx), floor((tmax - x1) / dx)], clipped
+    first = np.maximum(np.ceil((centers - width_left - x1) / dx), 0).astype(np.int64)
+    last = np.minimum(np.floor((centers + width_right - x1) / dx), n_samples - 1).astype(np.int64)
+
+    amplitudes = np.full(len(centers), np.nan)
+    for start in range(0, len(centers), _AMPLITUDE_BLOCK):
+        block = slice(start, start + _AMPLITUDE_BLOCK)
+        lo, hi = first[block], last[block]
+        if len(lo) == 0:
+            continue
+        # One row of sample indices per pulse, padded to the widest window
+        width = max(int((hi - lo).max()) + 1, 1)
+        index = lo[:, None] + np.arange(width)
+        inside = index <= hi[:, None]
+        np.minimum(index, n_samples - 1, out=index)
+
+        # Squared asymmetric Hann window, computed in place
+        window = index * dx
+        window += x1 - centers[block][:, None]
+        half_width = np.where(window < 0, width_left[block][:, None], width_right[block][:, None])
+        window *= np.pi
+        window /= half_width
+        np.cos(window, out=window)
+        window *= 0.5
+        window += 0.5
+        window *= inside
+        window *= window
+
+        energy = signal[index]
+        energy *= energy
+        energy *= window
+        rms = np.sqrt(energy.sum(axis=1) / window.sum(axis=1))
+        enough = (hi - lo + 1) >= 3
+        amplitudes[block] = np.where(enough, rms, np.nan)
+
+    keep = np.isfinite(amplitudes) & (amplitudes > 0)
+    return centers[keep], amplitudes[keep]
+
+
+def _mean_period(periods, in_range, max_period_factor):
+    """Praat's PointProcess_getMeanPeriod: mean of periods that are valid on their own."""
+    n = len(periods)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        previous = np.full(n, np.nan)
+        previous[1:] = periods[1:] / periods[:-1]
+        following = np.full(n, np.nan)
+        following[:-1] = periods[:-1] / periods[1:]
+        previous = np.where(previous < 1.0, 1.0 / previous, previous)
+        following = np.where(following < 1.0, 1.0 / following, following)
+    # A period is rejected only when it differs too much from both neighbours
+    isolated = (previous > max_period_factor) & (following > max_period_factor)
+    valid = in_range & (periods > 0) & ~isolated
+    if not valid.any():
+        return np.nan
+    return periods[valid].mean()
+
+
+def _relative_perturbation(periods, pair_ok, window):
+    """Mean |middle period - window average| over windows of valid periods, or None."""
+    n_windows = len(periods) - window + 1
+    if n_windows < 1:
+        return None
+    runs = np.lib.stride_tricks.sliding_window_view(pair_ok, window - 1).all(axis=1)
+    if not runs.any():
+        return None
+    averages = np.lib.stride_tricks.sliding_window_view(periods, window).mean(axis=1)
+    middle = periods[window // 2: window // 2 + n_windows]
+    return np.abs(middle - averages)[runs].sum() / runs.sum()
+
+
+def _amplitude_perturbation(a, gap_ok, ratio_ok, window):
+    """Mean |middle peak - window average| over windows of valid peaks, or None."""
+    n_windows = len(a) - window + 1
+    if n_windows < 1:
+        return None
+    pair_ok = gap_ok & ratio_ok
+    runs = np.lib.stride_tricks.sliding_window_view(pair_ok, window - 1).all(axis=1)
+    if not runs.any():
+        return None
+    averages = np.lib.stride_tricks.sliding_window_view(a, window).mean(axis=1)
+    middle = a[window // 2: window // 2 + n_windows]
+    return np.abs(middle - averages)[runs].sum() / runs.sum()
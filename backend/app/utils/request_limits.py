@@ -0,0 +1,89 @@
+import json
+import time
+from starlette.exceptions import HTTPException
+from app.utils.file_handler import MAX_UPLOAD_BYTES
+
+# Room for the other form fields and multipart boundaries
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+
+class RequestTooLargeError(HTTPException):
+    # An HTTPException so that FastAPI's body parsing re-raises it as-is
+    # and the exception handlers answer 413 instead of a generic 400.
+    def __init__(self, max_bytes):
+        super().__init__(status_code=413, detail=_too_large_detail(max_bytes))
+
+
+def _too_large_detail(max_bytes):
+    return f"Request body is larger than the {max_bytes // (1024 * 1024)} MB limit"
+
+
+class BodySizeLimitMiddleware:
+    """
+    Reject request bodies larger than `max_bytes` before they are buffered.
+
+    A declared Content-Length over the limit is refused straight away.
+    Chunked bodies are counted while they are received, and the request is
+    aborted with 413 as soon as the limit is crossed. Pure ASGI, so it sees
+    the body before Starlette's form parser spools it; for the same reason
+    it stamps `request.state.received_at` (a time.perf_counter() value) when
+    the request arrives, so the time spent receiving the body can be measured.
+    """
+
+    def __init__(self, app, max_bytes=MAX_UPLOAD_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        scope.setdefault("state", {})["received_at"] = time.perf_counter()
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    break
+                if declared > self.max_bytes:
+                    await self._reject(send)
+                    return
+                break
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise RequestTooLargeError(self.max_bytes)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except RequestTooLargeError:
+            if not response_started:
+                await self._reject(send)
+
+    async def _reject(self, send):
+        body = json.dumps({"detail": _too_large_detail(self.max_bytes)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
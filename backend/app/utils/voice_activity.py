@@ -0,0 +1,75 @@
+import numpy as np
+
+# Analysis frame length in seconds (non-overlapping)
+FRAME_SECONDS = 0.02
+
+# A frame is loud enough when its energy exceeds the noise floor (the
+# NOISE_PERCENTILE-th percentile of frame energies) by ENERGY_MARGIN_DB
+NOISE_PERCENTILE = 10
+ENERGY_MARGIN_DB = 12.0
+
+# Zero crossings per sample above which a frame is treated as noise or
+# frication rather than phonation (voiced speech stays well below it)
+MAX_ZERO_CROSSING_RATE = 0.3
+
+# Audio kept on either side of the active region, so that Praat's pitch
+# analysis sees the onset and offset of the phonation
+PADDING_SECONDS = 0.15
+
+
+def frame_activity(samples, sample_rate, frame_seconds=FRAME_SECONDS):
+    """
+    Energy / zero-crossing voice activity of consecutive frames.
+
+    Parameters:
+    -----------
+    samples : np.ndarray
+        Shape (channels, n_samples) or (n_samples,); channels are averaged.
+    sample_rate : float
+    frame_seconds : float
+
+    Returns:
+    --------
+    tuple : (active, frame_length) with one bool per full frame
+
+    If the energy barely varies across the recording (no silence to tell
+    apart, e.g. a clip that is phonation throughout) every frame counts as
+    loud enough and only the zero-crossing test applies.
+    """
+    mono = np.asarray(samples, dtype=np.float64)
+    if mono.ndim > 1:
+        mono = mono.mean(axis=0)
+    frame_length = max(1, int(round(frame_seconds * sample_rate)))
+    n_frames = len(mono) // frame_length
+    if n_frames == 0:
+        return np.zeros(0, dtype=bool), frame_length
+
+    frames = mono[:n_frames * frame_length].reshape(n_frames, frame_length)
+    frames = frames - frames.mean(axis=1, keepdims=True)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-12)
+    crossings = np.count_nonzero(np.diff(np.signbit(frames), axis=1), axis=1) / frame_length
+
+    noise_floor = np.percentile(energy_db, NOISE_PERCENTILE)
+    if energy_db.max() - noise_floor < ENERGY_MARGIN_DB:
+        loud = np.ones(n_frames, dtype=bool)
+    else:
+        loud = energy_db > noise_floor + ENERGY_MARGIN_DB
+    return loud & (crossings <= MAX_ZERO_CROSSING_RATE), frame_length
+
+
+def active_span(samples, sample_rate):
+    """
+    Sample range [first, last) from the first to the last active frame, padded.
+
+    Returns None when no frame is active; the caller then keeps the whole
+    recording rather than dropping all of it.
+    """
+    active, frame_length = frame_activity(samples, sample_rate)
+    indices = np.flatnonzero(active)
+    if len(indices) == 0:
+        return None
+    n_samples = np.shape(samples)[-1]
+    padding = int(round(PADDING_SECONDS * sample_rate))
+    first = max(0, indices[0] * frame_length - padding)
+    last = min(n_samples, (indices[-1] + 1) * frame_length + padding)
+    return int(first), int(last)
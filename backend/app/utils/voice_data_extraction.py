@@ -1,115 +1,461 @@
+from fractions import Fraction
+from functools import cached_property
+import os
+import time
 import parselmouth
 from parselmouth.praat import call
 import numpy as np
-from scipy.stats import entropy
-
-def extract_voice_features(audio_file):
-
-    sound = parselmouth.Sound(audio_file)
-    pitch = call(sound, "To Pitch", 0.0, 75, 600)
-
-    # Calculate jitter measures using individual Parselmouth functions
-    pointprocess = call(sound, "To PointProcess (periodic, cc)", 75, 600)
-    
-    # Jitter measurements
-    jitter_percent = call(pointprocess, "Get jitter (local)", 0, 0, 0.0001, 0.02, 1.3)
-    jitter_abs = call(pointprocess, "Get jitter (local, absolute)", 0, 0, 0.0001, 0.02, 1.3)
-    jitter_rap = call(pointprocess, "Get jitter (rap)", 0, 0, 0.0001, 0.02, 1.3)
-    jitter_ppq5 = call(pointprocess, "Get jitter (ppq5)", 0, 0, 0.0001, 0.02, 1.3)
-    jitter_ddp = call(pointprocess, "Get jitter (ddp)", 0, 0, 0.0001, 0.02, 1.3)
-    
-    # Shimmer measurements
-    shimmer = call([sound, pointprocess], "Get shimmer (local)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
-    shimmer_db = call([sound, pointprocess], "Get shimmer (local_dB)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
-    shimmer_apq3 = call([sound, pointprocess], "Get shimmer (apq3)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
-    shimmer_apq5 = call([sound, pointprocess], "Get shimmer (apq5)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
-    shimmer_apq11 = call([sound, pointprocess], "Get shimmer (apq11)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
-    shimmer_dda = call([sound, pointprocess], "Get shimmer (dda)", 0, 0, 0.0001, 0.02, 1.3, 1.6)
-    
-    # HNR (Harmonics-to-Noise Ratio)
-    harmonicity = call(sound, "To Harmonicity (cc)", 0.01, 75, 0.1, 1.0)
-    hnr = call(harmonicity, "Get mean", 0, 0)
-    
-    # NHR is typically 1/HNR, but we'll calculate it as a separate measure
-    nhr_value = 1.0 / (10**(hnr/10)) if hnr > -100 else float('inf')
-    
-    # Get pitch periods for nonlinear features
-    # Alternative approach: use pitch values directly for period calculation
-    pitch_values = pitch.selected_array['frequency']
-    voiced_frames = pitch_values[pitch_values > 0]  # Only voiced frames
-    
-    if len(voiced_frames) > 0:
-        # Convert frequency to periods (1/frequency)
-        periods = 1.0 / voiced_frames
-    else:
-        periods = np.array([])
-    
-    # Nonlinear features
-    if len(periods) < 50:
-        rpde = dfa = ppe = np.nan
-    else:
-        # PPE: Pitch Period Entropy
-        hist, _ = np.histogram(periods, bins=min(20, len(periods)//5), density=True)
-        hist = hist[hist > 0]
-        ppe = entropy(hist + 1e-10)
-        
-        # Simplified RPDE: Recurrence Period Density Entropy
-        diffs = np.abs(np.diff(periods))
-        rec_threshold = np.std(diffs) * 0.1
-        rec_matrix = (np.abs(periods[:, None] - periods[None, :]) < rec_threshold).astype(float)
-        np.fill_diagonal(rec_matrix, 0)
-        hist_rpde, _ = np.histogram(rec_matrix.flatten(), bins=2, density=True)
-        rpde = entropy(hist_rpde + 1e-10)
-        
-        # DFA: Detrended Fluctuation Analysis
-        y = np.cumsum(periods - np.mean(periods))
-        scales = np.logspace(np.log10(4), np.log10(len(y)/4), 8, dtype=int)
-        log_F = []
-        log_s = []
-        for s in scales:
-            if s > len(y) // 4:
-                continue
-            num_seg = len(y) // s
-            rms = []
-            for i in range(num_seg):
-                seg = y[i*s:(i+1)*s]
-                if len(seg) < 3:
-                    continue
-                x = np.arange(len(seg))
-                p = np.polyfit(x, seg, 1)
-                detrend = seg - np.polyval(p, x)
-                rms.append(np.sqrt(np.mean(detrend**2)))
-            if rms:
-                F = np.sqrt(np.mean(rms))
-                log_F.append(np.log(F))
-                log_s.append(np.log(s))
-        if len(log_F) > 1:
-            slope, _ = np.polyfit(log_s, log_F, 1)
-            dfa = slope
-        else:
-            dfa = np.nan
-    
+from scipy.signal import resample_poly
+from app.utils.nonlinear_features import (
+    detrended_fluctuation_analysis,
+    pitch_period_entropy,
+    recurrence_period_density_entropy,
+)
+from app.utils.perturbation import jitter_measures, peak_amplitudes, shimmer_measures
+from app.utils.voice_activity import active_span
+
+# Bump when a change to this module alters the extracted values, so that
+# cached features computed by the previous version are not reused.
+EXTRACTION_VERSION = 2
+
+# Praat analysis settings (pitch range in Hz, period range in seconds)
+PITCH_FLOOR = 75
+PITCH_CEILING = 600
+PERIOD_FLOOR = 0.0001
+PERIOD_CEILING = 0.02
+MAX_PERIOD_FACTOR = 1.3
+MAX_AMPLITUDE_FACTOR = 1.6
+
+# How jitter and shimmer are measured: 'numpy' computes all eleven measures
+# in one pass over the PointProcess pulses, 'praat' issues one Praat query
+# per measure. Both follow Praat's period and amplitude rules.
+PERTURBATION_ENGINE = os.getenv('PERTURBATION_ENGINE', 'numpy')
+
+# Feature groups and the Praat analyses they run on: 'pitch' (Pitch,
+# PointProcess, jitter and the nonlinear features of the pitch periods),
+# 'shimmer' (peak amplitudes at the pulses) and 'harmonicity' (HNR, NHR)
+FEATURE_GROUPS = {
+    'Jitter(%)': 'pitch', 'Jitter(Abs)': 'pitch', 'Jitter:RAP': 'pitch', 'Jitter:PPQ5': 'pitch',
+    'Jitter:DDP': 'pitch', 'RPDE': 'pitch', 'DFA': 'pitch', 'PPE': 'pitch',
+    'Shimmer': 'shimmer', 'Shimmer(dB)': 'shimmer', 'Shimmer:APQ3': 'shimmer',
+    'Shimmer:APQ5': 'shimmer', 'Shimmer:APQ11': 'shimmer', 'Shimmer:DDA': 'shimmer',
+    'NHR': 'harmonicity', 'HNR': 'harmonicity',
+}
+
+def parse_analysis_rates(spec):
+    """Parse 'group=Hz,...' (e.g. 'pitch=16000,harmonicity=0') into {group: Hz}; 0 keeps the original rate."""
+    rates = {group: 0 for group in set(FEATURE_GROUPS.values())}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        group, _, rate = item.partition('=')
+        if group.strip() not in rates:
+            raise ValueError(f"Unknown feature group in analysis rates: {group!r}")
+        rates[group.strip()] = int(rate)
+    return rates
+
+# Sample rate each feature group is analyzed at. Every group keeps the
+# original rate by default: resampling changes the model inputs (RPDE by a
+# few percent on steady vowels, jitter by far more on less periodic voices),
+# so it is opt-in, e.g. 'pitch=16000,shimmer=16000'. Check a setting with
+# `python -m benchmarks.analysis_rates` first.
+ANALYSIS_RATES = parse_analysis_rates(os.getenv('ANALYSIS_RATES', ''))
+
+# Average all channels into one before the analysis ('0' analyzes every channel)
+ANALYSIS_DOWNMIX = os.getenv('ANALYSIS_DOWNMIX', '1') != '0'
+
+# Trim leading and trailing silence / room noise (energy and zero-crossing
+# voice activity detection) before the Praat analyses ('0' disables it)
+VOICE_ACTIVITY_TRIM = os.getenv('VOICE_ACTIVITY_TRIM', '1') != '0'
+
+def parse_analysis_window(seconds, overlap):
+    """Parse the analysis window length and overlap in seconds; the overlap must be shorter than the window."""
+    seconds, overlap = float(seconds), float(overlap)
+    if seconds < 0:
+        raise ValueError(f"ANALYSIS_WINDOW_SECONDS must not be negative, got {seconds:g}")
+    if seconds > 0 and not 0 <= overlap < seconds:
+        raise ValueError(
+            f"ANALYSIS_WINDOW_OVERLAP must be at least 0 and shorter than ANALYSIS_WINDOW_SECONDS "
+            f"({seconds:g} s), got {overlap:g}"
+        )
+    return seconds, overlap
+
+# Segmented analysis of long recordings: window length and overlap in
+# seconds. 0 analyzes the whole recording as one block.
+ANALYSIS_WINDOW_SECONDS, ANALYSIS_WINDOW_OVERLAP = parse_analysis_window(
+    os.getenv('ANALYSIS_WINDOW_SECONDS', '0'), os.getenv('ANALYSIS_WINDOW_OVERLAP', '1.0'),
+)
+
+def get_extraction_params(features=None):
+    """Return every setting that influences the extracted feature values."""
     return {
-        'Jitter(%)': jitter_percent * 100, 
-        'Jitter(Abs)': jitter_abs, 
-        'Jitter:RAP': jitter_rap,
-        'Jitter:PPQ5': jitter_ppq5, 
-        'Jitter:DDP': jitter_ddp,
-        'Shimmer': shimmer, 
-        'Shimmer(dB)': shimmer_db, 
-        'Shimmer:APQ3': shimmer_apq3,
-        'Shimmer:APQ5': shimmer_apq5, 
-        'Shimmer:APQ11': shimmer_apq11, 
-        'Shimmer:DDA': shimmer_dda,
-        'NHR': nhr_value, 
-        'HNR': hnr,
-        'RPDE': float(rpde),
-        'DFA': float(dfa),
-        'PPE': float(ppe)
+        'version': EXTRACTION_VERSION,
+        'features': select_voice_features(features),
+        'pitch_floor': PITCH_FLOOR,
+        'pitch_ceiling': PITCH_CEILING,
+        'period_floor': PERIOD_FLOOR,
+        'period_ceiling': PERIOD_CEILING,
+        'max_period_factor': MAX_PERIOD_FACTOR,
+        'max_amplitude_factor': MAX_AMPLITUDE_FACTOR,
+        'perturbation_engine': PERTURBATION_ENGINE,
+        'voice_activity_trim': VOICE_ACTIVITY_TRIM,
+        'analysis_rates': ANALYSIS_RATES,
+        'downmix': ANALYSIS_DOWNMIX,
+        'window_seconds': ANALYSIS_WINDOW_SECONDS,
+        'window_overlap': ANALYSIS_WINDOW_OVERLAP,
     }
 
+# Voice features in the order of the training data
+VOICE_FEATURES = [
+    'Jitter(%)', 'Jitter(Abs)', 'Jitter:RAP', 'Jitter:PPQ5', 'Jitter:DDP',
+    'Shimmer', 'Shimmer(dB)', 'Shimmer:APQ3', 'Shimmer:APQ5', 'Shimmer:APQ11',
+    'Shimmer:DDA', 'NHR', 'HNR', 'RPDE', 'DFA', 'PPE',
+]
+
+# Nonlinear features need at least this many voiced pitch frames
+MIN_VOICED_FRAMES = 50
+
+
+class FeaturePlan:
+    """
+    Lazily evaluated Praat analysis of one sound.
+
+    Every intermediate object (Pitch, PointProcess, Harmonicity, pitch
+    periods) is built at most once, on first use, so a request only pays
+    for the analyses its features depend on. The PointProcess is derived
+    from the existing Pitch ("Sound & Pitch: To PointProcess (cc)"), which
+    gives the same pulses as "To PointProcess (periodic, cc)" without
+    repeating the periodicity analysis.
+
+    With the 'numpy' perturbation engine, all jitter measures are computed
+    together from the pulse times and all shimmer measures from the peak
+    amplitudes, instead of one Praat query per measure.
+
+    Each feature group runs on the sound resampled to its rate in `rates`
+    (see ANALYSIS_RATES); a resampled sound is built once and shared by the
+    groups with the same rate.
+    """
+
+    def __init__(self, sound, perturbation_engine=PERTURBATION_ENGINE, rates=None):
+        if perturbation_engine not in ('numpy', 'praat'):
+            raise ValueError(f"Unknown perturbation engine: {perturbation_engine}")
+        self.sound = sound
+        self.perturbation_engine = perturbation_engine
+        self.rates = rates or {}
+        self._resampled = {}
+        # Seconds spent in resampling ('resample') and in each nonlinear
+        # kernel ('ppe' / 'rpde' / 'dfa')
+        self.timings = {}
+
+    def sound_for(self, group):
+        """The sound at the analysis rate of `group`."""
+        rate = self.rates.get(group, 0)
+        if rate not in self._resampled:
+            start = time.perf_counter()
+            self._resampled[rate] = resample_sound(self.sound, rate)
+            self.timings['resample'] = self.timings.get('resample', 0.0) + time.perf_counter() - start
+        return self._resampled[rate]
+
+    @cached_property
+    def pitch(self):
+        return call(self.sound_for('pitch'), "To Pitch", 0.0, PITCH_FLOOR, PITCH_CEILING)
+
+    @cached_property
+    def pointprocess(self):
+        return call([self.sound_for('pitch'), self.pitch], "To PointProcess (cc)")
+
+    @cached_property
+    def harmonicity(self):
+        return call(self.sound_for('harmonicity'), "To Harmonicity (cc)", 0.01, PITCH_FLOOR, 0.1, 1.0)
+
+    @cached_property
+    def hnr(self):
+        return call(self.harmonicity, "Get mean", 0, 0)
+
+    @cached_property
+    def periods(self):
+        # Use pitch values directly for period calculation (voiced frames only)
+        pitch_values = self.pitch.selected_array['frequency']
+        voiced_frames = pitch_values[pitch_values > 0]
+        if len(voiced_frames) > 0:
+            return 1.0 / voiced_frames
+        return np.array([])
+
+    @cached_property
+    def pulse_times(self):
+        if call(self.pointprocess, "Get number of points") == 0:
+            return np.array([])
+        return call(self.pointprocess, "To Matrix").values[0]
+
+    @cached_property
+    def jitter_values(self):
+        return jitter_measures(self.pulse_times, PERIOD_FLOOR, PERIOD_CEILING, MAX_PERIOD_FACTOR)
+
+    @cached_property
+    def shimmer_values(self):
+        sound = self.sound_for('shimmer')
+        times, amplitudes = peak_amplitudes(self.pulse_times, sound.values, sound.x1, sound.dx,
+                                            PERIOD_FLOOR, PERIOD_CEILING, MAX_PERIOD_FACTOR)
+        return shimmer_measures(times, amplitudes, PERIOD_FLOOR, PERIOD_CEILING, MAX_AMPLITUDE_FACTOR)
+
+    def jitter(self, measure):
+        if self.perturbation_engine == 'numpy':
+            return self.jitter_values[measure]
+        return call(self.pointprocess, f"Get jitter ({measure})",
+                    0, 0, PERIOD_FLOOR, PERIOD_CEILING, MAX_PERIOD_FACTOR)
+
+    def shimmer(self, measure):
+        if self.perturbation_engine == 'numpy':
+            return self.shimmer_values[measure]
+        return call([self.sound_for('shimmer'), self.pointprocess], f"Get shimmer ({measure})",
+                    0, 0, PERIOD_FLOOR, PERIOD_CEILING, MAX_PERIOD_FACTOR, MAX_AMPLITUDE_FACTOR)
+
+    def nhr(self):
+        # NHR is typically 1/HNR, but we'll calculate it as a separate measure
+        hnr = self.hnr
+        return 1.0 / (10**(hnr/10)) if hnr > -100 else float('inf')
+
+    def nonlinear(self, name, kernel):
+        periods = self.periods
+        if len(periods) < MIN_VOICED_FRAMES:
+            return np.nan
+        start = time.perf_counter()
+        value = float(kernel(periods))
+        self.timings[name] = time.perf_counter() - start
+        return value
+
+
+_FEATURE_EXTRACTORS = {
+    'Jitter(%)': lambda plan: plan.jitter("local") * 100,
+    'Jitter(Abs)': lambda plan: plan.jitter("local, absolute"),
+    'Jitter:RAP': lambda plan: plan.jitter("rap"),
+    'Jitter:PPQ5': lambda plan: plan.jitter("ppq5"),
+    'Jitter:DDP': lambda plan: plan.jitter("ddp"),
+    'Shimmer': lambda plan: plan.shimmer("local"),
+    'Shimmer(dB)': lambda plan: plan.shimmer("local_dB"),
+    'Shimmer:APQ3': lambda plan: plan.shimmer("apq3"),
+    'Shimmer:APQ5': lambda plan: plan.shimmer("apq5"),
+    'Shimmer:APQ11': lambda plan: plan.shimmer("apq11"),
+    'Shimmer:DDA': lambda plan: plan.shimmer("dda"),
+    'NHR': lambda plan: plan.nhr(),
+    'HNR': lambda plan: plan.hnr,
+    'RPDE': lambda plan: plan.nonlinear('rpde', recurrence_period_density_entropy),
+    'DFA': lambda plan: plan.nonlinear('dfa', detrended_fluctuation_analysis),
+    'PPE': lambda plan: plan.nonlinear('ppe', pitch_period_entropy),
+}
+
+
+def downmix_sound(sound):
+    """Average the channels of `sound` into a mono Sound on the same time axis."""
+    if sound.n_channels == 1:
+        return sound
+    return parselmouth.Sound(sound.values.mean(axis=0), sampling_frequency=sound.sampling_frequency,
+                             start_time=sound.xmin)
+
+
+def resample_sound(sound, rate):
+    """
+    Downsample `sound` to about `rate` Hz with a polyphase anti-aliasing filter.
+
+    The rate ratio is rounded to a fraction with a denominator of at most
+    1000 and the exact resulting rate is used. The first sample keeps its
+    time, so pulse times stay comparable between rates. A rate of 0, or one
+    at or above the current rate, returns `sound` unchanged.
+    """
+    if not rate or rate >= sound.sampling_frequency:
+        return sound
+    ratio = Fraction(rate / sound.sampling_frequency).limit_denominator(1000)
+    values = resample_poly(sound.values, ratio.numerator, ratio.denominator, axis=1)
+    new_rate = sound.sampling_frequency * ratio.numerator / ratio.denominator
+    return parselmouth.Sound(values, sampling_frequency=new_rate, start_time=sound.x1 - 0.5 / new_rate)
+
+
+def trim_to_voice_activity(sound):
+    """
+    Cut `sound` down to its voice-active span (see `voice_activity.active_span`).
+
+    Returns:
+    --------
+    tuple : (trimmed Sound on the original time axis, seconds dropped)
+    """
+    span = active_span(sound.values, sound.sampling_frequency)
+    if span is None or span == (0, sound.n_samples):
+        return sound, 0.0
+    first, last = span
+    trimmed = parselmouth.Sound(sound.values[:, first:last], sampling_frequency=sound.sampling_frequency,
+                                start_time=sound.xmin + first * sound.dx)
+    return trimmed, (sound.n_samples - (last - first)) * sound.dx
+
+
+def select_voice_features(required):
+    """Voice features among `required` (e.g. the model's feature names), in canonical order."""
+    if required is None:
+        return list(VOICE_FEATURES)
+    required = set(required)
+    return [name for name in VOICE_FEATURES if name in required]
+
+
+def extract_voice_features(audio_file, features=None, perturbation_engine=PERTURBATION_ENGINE,
+                           timings=None, trim_silence=VOICE_ACTIVITY_TRIM, activity=None,
+                           rates=ANALYSIS_RATES, downmix=ANALYSIS_DOWNMIX):
+    """
+    Extract voice features used by the model.
+
+    Parameters:
+    -----------
+    audio_file : str or parselmouth.Sound
+        Path to an audio file or an already constructed Sound.
+    features : iterable of str, optional
+        Feature names to compute. Names that are not voice features (age,
+        sex, ...) are ignored. Defaults to all 16 voice features; Praat
+        analyses that none of the requested features need are skipped.
+    perturbation_engine : str
+        'numpy' or 'praat', see PERTURBATION_ENGINE.
+    timings : dict, optional
+        If given, receives the seconds spent in downmixing and resampling
+        ('resample'), in voice activity detection ('voice_activity'), in the
+        Praat analyses ('extraction') and in each nonlinear kernel ('ppe',
+        'rpde', 'dfa').
+    trim_silence : bool
+        Drop leading and trailing stretches without voice activity before
+        analyzing, see VOICE_ACTIVITY_TRIM.
+    activity : dict, optional
+        If given, receives the recording 'duration', and the
+        'analyzed_seconds' and 'dropped_seconds' after trimming.
+    rates : dict
+        Analysis sample rate per feature group, see ANALYSIS_RATES.
+    downmix : bool
+        Average the channels into one first, see ANALYSIS_DOWNMIX.
+
+    Returns:
+    --------
+    dict : feature name -> value
+    """
+    if isinstance(audio_file, parselmouth.Sound):
+        sound = audio_file
+    else:
+        sound = parselmouth.Sound(audio_file)
+
+    start = time.perf_counter()
+    if downmix:
+        sound = downmix_sound(sound)
+    downmixed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    duration = sound.duration
+    dropped = 0.0
+    if trim_silence:
+        sound, dropped = trim_to_voice_activity(sound)
+    if timings is not None:
+        timings['voice_activity'] = time.perf_counter() - start
+    if activity is not None:
+        activity.update(duration=duration, analyzed_seconds=duration - dropped, dropped_seconds=dropped)
+
+    start = time.perf_counter()
+    plan = FeaturePlan(sound, perturbation_engine, rates)
+    values = {name: _FEATURE_EXTRACTORS[name](plan) for name in select_voice_features(features)}
+
+    if timings is not None:
+        timings['extraction'] = time.perf_counter() - start - sum(plan.timings.values())
+        timings.update(plan.timings)
+        timings['resample'] = timings.get('resample', 0.0) + downmixed
+    return values
+
+
+def iter_window_features(windows, features=None, perturbation_engine=PERTURBATION_ENGINE,
+                         timings=None, trim_silence=VOICE_ACTIVITY_TRIM, rates=ANALYSIS_RATES,
+                         downmix=ANALYSIS_DOWNMIX):
+    """
+    Extract voice features window by window.
+
+    Parameters:
+    -----------
+    windows : iterable of (start_seconds, samples, sample_rate)
+        E.g. from `file_handler.iter_audio_windows`. Each window is analyzed
+        as its own Sound and released before the next one is read.
+    features, perturbation_engine, trim_silence, rates, downmix :
+        As for `extract_voice_features`; silence is trimmed per window.
+    timings : dict, optional
+        Accumulates the stage seconds of every window.
+
+    Yields:
+    -------
+    dict : {'start': seconds, 'end': seconds, 'voiced_frames': voiced pitch
+            frames in the window, 'dropped_seconds': seconds trimmed as
+            silence, 'features': feature name -> value}
+    """
+    names = select_voice_features(features)
+    for start_time, samples, sample_rate in windows:
+        started = time.perf_counter()
+        window = parselmouth.Sound(samples, sampling_frequency=sample_rate, start_time=start_time)
+        if downmix:
+            window = downmix_sound(window)
+        sound, dropped = trim_to_voice_activity(window) if trim_silence else (window, 0.0)
+        if timings is not None:
+            timings['voice_activity'] = timings.get('voice_activity', 0.0) + time.perf_counter() - started
+
+        plan = FeaturePlan(sound, perturbation_engine, rates)
+        started = time.perf_counter()
+        values = {name: _FEATURE_EXTRACTORS[name](plan) for name in names}
+        voiced_frames = len(plan.periods)
+
+        if timings is not None:
+            measured = sum(plan.timings.values())
+            timings['extraction'] = timings.get('extraction', 0.0) + time.perf_counter() - started - measured
+            for name, seconds in plan.timings.items():
+                timings[name] = timings.get(name, 0.0) + seconds
+        yield {'start': window.xmin, 'end': window.xmax, 'voiced_frames': voiced_frames,
+               'dropped_seconds': dropped, 'features': values}
+
+
+def aggregate_window_features(windows, features=None):
+    """
+    Combine per-window features into one value per feature.
+
+    Each window is weighted by its number of voiced pitch frames, so silent
+    or unvoiced stretches do not dilute the result; non-finite values (e.g.
+    the nonlinear features of a window with fewer than MIN_VOICED_FRAMES
+    voiced frames) are left out. If no window is voiced, the plain mean of
+    the finite values is used, and NaN if there are none.
+    """
+    aggregated = {}
+    for name in select_voice_features(features):
+        values = np.array([window['features'][name] for window in windows], dtype=np.float64)
+        weights = np.array([window['voiced_frames'] for window in windows], dtype=np.float64)
+        finite = np.isfinite(values)
+        if not finite.any():
+            aggregated[name] = np.nan
+        elif weights[finite].sum() > 0:
+            aggregated[name] = float(np.average(values[finite], weights=weights[finite]))
+        else:
+            aggregated[name] = float(values[finite].mean())
+    return aggregated
+
+
+def extract_windowed_features(windows, features=None, perturbation_engine=PERTURBATION_ENGINE,
+                              timings=None, on_window=None, trim_silence=VOICE_ACTIVITY_TRIM,
+                              rates=ANALYSIS_RATES, downmix=ANALYSIS_DOWNMIX):
+    """
+    Segmented counterpart of `extract_voice_features` for long recordings.
+
+    Only one window of samples and its Praat objects are alive at a time,
+    so peak memory depends on the window length rather than the duration.
+    Perturbation measures and HNR aggregate to values close to a whole-file
+    analysis; RPDE, DFA and PPE become averages of window-level values.
+
+    Parameters:
+    -----------
+    windows : iterable of (start_seconds, samples, sample_rate)
+        See `iter_window_features`.
+    on_window : callable, optional
+        Called with each window result as soon as it is computed.
 
-# Load audio file
-# audio_file = "test_voice.wav" 
-# features = measure_jitter_shimmer(audio_file)
-# print(features)
\ No newline at end of file
+    Returns:
+    --------
+    tuple : (aggregated feature name -> value, list of window results)
+    """
+    results = []
+    for window in iter_window_features(windows, features, perturbation_engine, timings, trim_silence,
+                                       rates, downmix):
+        if on_window is not None:
+            on_window(window)
+        results.append(window)
+    return aggregate_window_features(results, features), results
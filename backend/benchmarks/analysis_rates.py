@@ -0,0 +1,199 @@
+"""
+Validation report for the analysis-rate resampling and mono downmix.
+
+Run from the backend directory:
+
+    python -m benchmarks.analysis_rates
+    python -m benchmarks.analysis_rates --rates pitch=16000,shimmer=16000,harmonicity=16000
+    python -m benchmarks.analysis_rates --files take1.wav take2.wav --output drift.json
+
+Every recording is analyzed twice: at its original rate and channels (the
+reference), and with the downmix and per-group rates under test (by default
+the configured ANALYSIS_RATES / ANALYSIS_DOWNMIX). The report lists how far
+each feature drifts from the reference and how much Praat time is saved.
+Silence trimming is off in both runs so that only the resampling differs.
+The exit status is 1 when --max-drift is given and a feature exceeds it.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from benchmarks.audio import sustained_vowel
+
+# Synthetic takes: (sample rate, channels, f0 Hz, jitter, shimmer). Browsers
+# typically record at 48 kHz, often in stereo. The first three are steady,
+# low-jitter vowels, where the relative drift of jitter and RPDE is largest.
+SYNTHETIC_TAKES = (
+    (44100, 1, 110.0, 0.002, 0.02),
+    (48000, 1, 140.0, 0.002, 0.02),
+    (48000, 2, 220.0, 0.002, 0.03),
+    (44100, 1, 110.0, 0.005, 0.03),
+    (44100, 1, 140.0, 0.01, 0.05),
+    (48000, 2, 140.0, 0.01, 0.05),
+    (48000, 1, 220.0, 0.02, 0.08),
+    (48000, 2, 300.0, 0.01, 0.10),
+)
+
+DEFAULT_DURATION = 5.0
+
+
+def synthetic_recordings(duration=DEFAULT_DURATION):
+    """
+    Sustained vowels covering the SYNTHETIC_TAKES settings.
+
+    Returns:
+    --------
+    list of dict : {'name', 'samples' (channels, n), 'sample_rate'}
+    """
+    recordings = []
+    for seed, (sample_rate, channels, f0, jitter, shimmer) in enumerate(SYNTHETIC_TAKES):
+        signal = sustained_vowel(duration, sample_rate, f0=f0, jitter=jitter, shimmer=shimmer, seed=seed)
+        # Slightly different right channel so the downmix is not a no-op
+        samples = np.vstack([signal, 0.8 * signal][:channels])
+        recordings.append({
+            'name': f"{sample_rate // 1000}k-{'stereo' if channels == 2 else 'mono'}-f0={f0:g}",
+            'samples': samples,
+            'sample_rate': sample_rate,
+        })
+    return recordings
+
+
+def file_recordings(paths):
+    """Decode audio files the way the API does."""
+    from app.utils.file_handler import decode_audio_bytes
+
+    recordings = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            samples, sample_rate = decode_audio_bytes(f.read(), os.path.splitext(path)[1].lower())
+        recordings.append({'name': os.path.basename(path), 'samples': samples, 'sample_rate': sample_rate})
+    return recordings
+
+
+def analyze(recording, rates, downmix, repeat):
+    """
+    Extract every voice feature `repeat` times.
+
+    Returns:
+    --------
+    tuple : (features, fastest run's seconds per stage)
+    """
+    import parselmouth
+    from app.utils.voice_data_extraction import extract_voice_features
+
+    best = None
+    for _ in range(repeat):
+        sound = parselmouth.Sound(recording['samples'], sampling_frequency=recording['sample_rate'])
+        timings = {}
+        features = extract_voice_features(sound, timings=timings, trim_silence=False,
+                                          rates=rates, downmix=downmix)
+        if best is None or sum(timings.values()) < sum(best.values()):
+            best = timings
+    return features, best
+
+
+def drift_report(recordings, rates, downmix, repeat=3):
+    """
+    Compare the features under `rates` / `downmix` with the full-rate reference.
+
+    Returns:
+    --------
+    dict : 'recordings' (per-recording features, drift and timings) and
+           'features' (mean / max relative drift per feature over all recordings)
+    """
+    per_recording = []
+    for recording in recordings:
+        reference, reference_timings = analyze(recording, {}, False, repeat)
+        candidate, candidate_timings = analyze(recording, rates, downmix, repeat)
+        drift = {}
+        for name, value in reference.items():
+            difference = abs(candidate[name] - value)
+            drift[name] = {
+                'reference': value,
+                'candidate': candidate[name],
+                'absolute': difference,
+                'relative': difference / abs(value) if value else difference,
+            }
+        reference_ms = sum(reference_timings.values()) * 1000.0
+        candidate_ms = sum(candidate_timings.values()) * 1000.0
+        per_recording.append({
+            'name': recording['name'],
+            'sample_rate': recording['sample_rate'],
+            'channels': int(np.shape(recording['samples'])[0]) if np.ndim(recording['samples']) > 1 else 1,
+            'reference_ms': reference_ms,
+            'candidate_ms': candidate_ms,
+            'speedup': reference_ms / candidate_ms if candidate_ms else None,
+            'reference_timings': reference_timings,
+            'candidate_timings': candidate_timings,
+            'drift': drift,
+        })
+
+    features = {}
+    for name in per_recording[0]['drift'] if per_recording else ():
+        relative = np.array([entry['drift'][name]['relative'] for entry in per_recording])
+        absolute = np.array([entry['drift'][name]['absolute'] for entry in per_recording])
+        features[name] = {
+            'mean_relative': float(np.nanmean(relative)),
+            'max_relative': float(np.nanmax(relative)),
+            'max_absolute': float(np.nanmax(absolute)),
+        }
+    return {'recordings': per_recording, 'features': features}
+
+
+def main(argv=None):
+    from app.utils.voice_data_extraction import (
+        ANALYSIS_DOWNMIX,
+        ANALYSIS_RATES,
+        FEATURE_GROUPS,
+        parse_analysis_rates,
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rates', help="rates under test, e.g. 'pitch=16000,harmonicity=0' "
+                                        "(default: ANALYSIS_RATES)")
+    parser.add_argument('--no-downmix', action='store_true', help='keep every channel in the test run')
+    parser.add_argument('--files', nargs='+', help='recordings to use instead of the synthetic vowels')
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION,
+                        help='length of the synthetic recordings in seconds')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per analysis; the fastest is reported')
+    parser.add_argument('--max-drift', type=float,
+                        help='fail when a feature drifts by more than this relative amount (e.g. 0.01)')
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    rates = parse_analysis_rates(args.rates) if args.rates is not None else ANALYSIS_RATES
+    downmix = ANALYSIS_DOWNMIX and not args.no_downmix
+    recordings = file_recordings(args.files) if args.files else synthetic_recordings(args.duration)
+
+    start = time.perf_counter()
+    report = drift_report(recordings, rates, downmix, args.repeat)
+    report['meta'] = {'rates': rates, 'downmix': downmix, 'seconds': time.perf_counter() - start}
+
+    print(f"Rates {rates}, downmix {'on' if downmix else 'off'}\n")
+    print(f"{'recording':<28} {'full rate':>11} {'resampled':>11} {'speedup':>8}")
+    for entry in report['recordings']:
+        print(f"{entry['name']:<28} {entry['reference_ms']:8.1f} ms {entry['candidate_ms']:8.1f} ms "
+              f"{entry['speedup']:7.2f}x")
+    print(f"\n{'feature':<16} {'group':<12} {'mean drift':>11} {'max drift':>10} {'max abs':>11}")
+    for name, drift in report['features'].items():
+        print(f"{name:<16} {FEATURE_GROUPS[name]:<12} {drift['mean_relative'] * 100:10.3f}% "
+              f"{drift['max_relative'] * 100:9.3f}% {drift['max_absolute']:11.3g}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.max_drift is not None:
+        exceeded = [name for name, drift in report['features'].items() if drift['max_relative'] > args.max_drift]
+        if exceeded:
+            print(f"\nDrift above {args.max_drift:g}: {', '.join(exceeded)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,143 @@
+import io
+import os
+import wave
+
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import which
+
+SAMPLE_RATE = 44100
+
+# Encodings that only need the standard library / pydub's WAV support
+WAV_FORMATS = ('wav', 'wav-stereo', 'wav-24bit')
+
+# Encodings that go through ffmpeg; skipped when it is not installed
+COMPRESSED_FORMATS = ('mp3', 'flac', 'ogg')
+
+
+def sustained_vowel(duration, sample_rate=SAMPLE_RATE, f0=140.0, jitter=0.01, shimmer=0.05, seed=0):
+    """
+    Synthetic sustained vowel with controlled cycle-to-cycle perturbation.
+
+    Each glottal cycle is a short harmonic waveform whose period and
+    amplitude are drawn around `1 / f0` and 1.0 with relative standard
+    deviations `jitter` and `shimmer`. A little noise keeps the
+    harmonics-to-noise ratio finite.
+
+    Parameters:
+    -----------
+    duration : float
+        Length in seconds.
+    sample_rate : int
+        Samples per second.
+    f0 : float
+        Mean fundamental frequency in Hz.
+    jitter, shimmer : float
+        Relative standard deviation of the period and of the cycle amplitude.
+    seed : int
+        Seed of the random generator, so that every run produces the same audio.
+
+    Returns:
+    --------
+    numpy.ndarray : float samples in [-1, 1]
+    """
+    rng = np.random.default_rng(seed)
+    n_samples = int(duration * sample_rate)
+    cycles = []
+    total = 0
+    while total < n_samples:
+        period = max(int(sample_rate / f0 * (1.0 + jitter * rng.standard_normal())), 2)
+        amplitude = 1.0 + shimmer * rng.standard_normal()
+        phase = np.arange(period) / period
+        cycle = (np.sin(2 * np.pi * phase)
+                 + 0.5 * np.sin(4 * np.pi * phase)
+                 + 0.25 * np.sin(6 * np.pi * phase))
+        cycles.append(amplitude * cycle)
+        total += period
+
+    signal = np.concatenate(cycles)[:n_samples]
+    signal = 0.3 * signal / np.abs(signal).max()
+    signal += 0.002 * rng.standard_normal(n_samples)
+    return np.clip(signal, -1.0, 1.0)
+
+
+def available_formats():
+    """Formats that can be encoded (and decoded by the API) on this machine."""
+    formats = list(WAV_FORMATS)
+    if which("ffmpeg") or which("avconv"):
+        formats.extend(COMPRESSED_FORMATS)
+    return formats
+
+
+def encode(signal, fmt, sample_rate=SAMPLE_RATE):
+    """
+    Encode float samples as one of `available_formats()`.
+
+    Returns:
+    --------
+    tuple : (file bytes, file suffix, content type)
+    """
+    if fmt == 'wav':
+        return _wav_bytes(signal, sample_rate, channels=1, sample_width=2), '.wav', 'audio/wav'
+    if fmt == 'wav-stereo':
+        return _wav_bytes(signal, sample_rate, channels=2, sample_width=2), '.wav', 'audio/wav'
+    if fmt == 'wav-24bit':
+        return _wav_bytes(signal, sample_rate, channels=1, sample_width=3), '.wav', 'audio/wav'
+    if fmt in COMPRESSED_FORMATS:
+        segment = AudioSegment.from_file(
+            io.BytesIO(_wav_bytes(signal, sample_rate, channels=1, sample_width=2)), format='wav')
+        buffer = io.BytesIO()
+        segment.export(buffer, format=fmt)
+        content_type = {'mp3': 'audio/mpeg', 'flac': 'audio/flac', 'ogg': 'audio/ogg'}[fmt]
+        return buffer.getvalue(), f'.{fmt}', content_type
+    raise ValueError(f"Unknown audio format: {fmt}")
+
+
+def write_corpus(directory, durations, formats, sample_rate=SAMPLE_RATE):
+    """
+    Write one synthetic recording per (format, duration) into `directory`.
+
+    Returns:
+    --------
+    list of dict : {'name', 'format', 'duration', 'path', 'suffix', 'content_type'}
+    """
+    corpus = []
+    for duration in durations:
+        signal = sustained_vowel(duration, sample_rate, seed=int(duration * 1000))
+        for fmt in formats:
+            content, suffix, content_type = encode(signal, fmt, sample_rate)
+            name = f"{fmt}/{duration:g}s"
+            path = os.path.join(directory, f"vowel_{fmt}_{duration:g}s{suffix}")
+            with open(path, 'wb') as f:
+                f.write(content)
+            corpus.append({
+                'name': name,
+                'format': fmt,
+                'duration': duration,
+                'path': path,
+                'suffix': suffix,
+                'content_type': content_type,
+            })
+    return corpus
+
+
+def _wav_bytes(signal, sample_rate, channels, sample_width):
+    scale = 2 ** (8 * sample_width - 1) - 1
+    samples = np.round(signal * scale).astype('<i4')
+    if channels == 2:
+        # Slightly different right channel so the downmix is not a no-op
+        right = np.round(0.8 * signal * scale).astype('<i4')
+        samples = np.column_stack([samples, right]).ravel()
+    if sample_width == 2:
+        frames = samples.astype('<i2').tobytes()
+    else:
+        # Little-endian 24-bit: drop the high byte of each 32-bit sample
+        frames = samples.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(sample_rate)
+        w.writeframes(frames)
+    return buffer.getvalue()
@@ -0,0 +1,114 @@
+"""
+CPU and latency of the compressed-upload decoders under concurrent load.
+
+Run from the backend directory:
+
+    python -m benchmarks.decoders
+    python -m benchmarks.decoders --files take1.webm take2.ogg --concurrency 8 --decodes 80
+
+Every recording is decoded `--decodes` times, `--concurrency` at a time,
+by each available decoder: 'pyav' (what the API's decoder workers run
+when PyAV is installed) and 'ffmpeg' (one ffmpeg process per decode). The
+report lists the CPU time per decode (this process and its children),
+the median and 95th percentile latency, and the throughput.
+"""
+import argparse
+import asyncio
+import os
+import resource
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.audio import available_formats, write_corpus
+
+
+def cpu_seconds():
+    """User + system CPU time of this process and its waited-for children."""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def available_decoders():
+    from app.utils.file_handler import FFMPEG_BINARY, av, decode_with_ffmpeg, decode_with_pyav
+
+    decoders = {}
+    if av is not None:
+        decoders['pyav'] = lambda content, suffix: decode_with_pyav(content)
+    if shutil.which(FFMPEG_BINARY):
+        decoders['ffmpeg'] = decode_with_ffmpeg
+    return decoders
+
+
+async def measure(decode, content, suffix, decodes, concurrency):
+    """
+    Decode `content` `decodes` times, at most `concurrency` at once, on threads.
+
+    Returns:
+    --------
+    dict : 'cpu_ms' per decode, 'p50_ms', 'p95_ms', 'per_second'
+    """
+    await asyncio.to_thread(decode, content, suffix)  # imports and first-use setup
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with slots:
+            start = time.perf_counter()
+            await asyncio.to_thread(decode, content, suffix)
+            latencies.append(time.perf_counter() - start)
+
+    cpu_start, wall_start = cpu_seconds(), time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(decodes)))
+    wall = time.perf_counter() - wall_start
+    latencies.sort()
+    return {
+        'cpu_ms': (cpu_seconds() - cpu_start) / decodes * 1000.0,
+        'p50_ms': statistics.median(latencies) * 1000.0,
+        'p95_ms': latencies[max(0, int(0.95 * decodes) - 1)] * 1000.0,
+        'per_second': decodes / wall,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', nargs='+', help='compressed recordings (default: synthetic MP3 / OGG vowels)')
+    parser.add_argument('--durations', nargs='+', type=float, default=[3.0, 10.0],
+                        help='lengths of the synthetic recordings in seconds')
+    parser.add_argument('--decodes', type=int, default=40, help='decodes per recording and decoder')
+    parser.add_argument('--concurrency', type=int, default=4, help='decodes running at once')
+    args = parser.parse_args(argv)
+
+    decoders = available_decoders()
+    if not decoders:
+        parser.error("neither PyAV nor ffmpeg is installed")
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.files:
+            recordings = [(os.path.basename(path), path) for path in args.files]
+        else:
+            formats = [fmt for fmt in available_formats() if not fmt.startswith('wav')]
+            if not formats:
+                parser.error("cannot encode compressed audio here (is ffmpeg installed?); pass --files")
+            recordings = [(entry['name'], entry['path'])
+                          for entry in write_corpus(directory, args.durations, formats)]
+
+        print(f"{args.decodes} decodes per row, {args.concurrency} at a time\n")
+        print(f"{'recording':<16} {'decoder':<8} {'cpu/decode':>11} {'p50':>10} {'p95':>10} {'decodes/s':>10}")
+        for name, path in recordings:
+            with open(path, 'rb') as f:
+                content = f.read()
+            suffix = os.path.splitext(path)[1].lower()
+            for decoder, decode in decoders.items():
+                result = asyncio.run(measure(decode, content, suffix, args.decodes, args.concurrency))
+                print(f"{name:<16} {decoder:<8} {result['cpu_ms']:8.1f} ms {result['p50_ms']:7.1f} ms "
+                      f"{result['p95_ms']:7.1f} ms {result['per_second']:10.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
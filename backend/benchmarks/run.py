@@ -0,0 +1,333 @@
+"""
+Benchmarks for the voice analysis hot paths.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --output bench.json
+    python -m benchmarks.run --baseline bench.json
+
+Each (case, recording) pair runs in a fresh process, so the reported peak
+RSS belongs to that benchmark alone. The exit status is 1 when a baseline
+is given and a benchmark got slower or bigger than the tolerance allows.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.audio import available_formats, write_corpus
+
+CASES = ('extract', 'convert', 'predict', 'voice')
+
+# Case -> whether it runs once per recording (False: once overall)
+PER_RECORDING = {'extract': True, 'convert': True, 'predict': False, 'voice': True}
+
+DEFAULT_DURATIONS = (3.0, 10.0, 30.0)
+
+# Relative slowdown / growth above which a benchmark counts as a regression
+DEFAULT_TOLERANCE = 0.10
+
+# Latency differences below this many milliseconds are treated as noise
+DEFAULT_MIN_DELTA_MS = 1.0
+
+BASIC_INFO = {'name': 'benchmark', 'age': 60, 'sex': 'male', 'test_time': 5.0}
+
+
+def bench_extract(recording):
+    """extract_voice_features on decoded samples (decoding not timed)."""
+    import parselmouth
+    from app.utils.file_handler import decode_audio_bytes
+    from app.utils.voice_data_extraction import extract_voice_features
+
+    with open(recording['path'], 'rb') as f:
+        samples, sample_rate = decode_audio_bytes(f.read(), recording['suffix'])
+    sound = parselmouth.Sound(samples, sampling_frequency=sample_rate)
+    return lambda: extract_voice_features(sound)
+
+
+def bench_convert(recording):
+    """save_temp_file: stream the upload to disk and convert it to WAV."""
+    from starlette.datastructures import Headers, UploadFile
+    from app.utils.file_handler import save_temp_file
+
+    with open(recording['path'], 'rb') as f:
+        content = f.read()
+    loop = asyncio.new_event_loop()
+
+    def run():
+        upload = UploadFile(io.BytesIO(content), filename=os.path.basename(recording['path']),
+                            headers=Headers({'content-type': recording['content_type']}))
+        path = loop.run_until_complete(save_temp_file(upload))
+        os.remove(path)
+
+    if recording['suffix'] != '.wav':
+        check_mislabelled_upload(loop, content)
+    return run
+
+
+def check_mislabelled_upload(loop, content):
+    """
+    save_temp_file on compressed audio named and typed as WAV must still
+    return a complete WAV file (the converted output once overwrote the
+    upload, or was deleted along with it).
+    """
+    from starlette.datastructures import Headers, UploadFile
+    from app.utils.file_handler import decode_wav, save_temp_file
+
+    upload = UploadFile(io.BytesIO(content), filename='mislabelled.wav',
+                        headers=Headers({'content-type': 'audio/wav'}))
+    path = loop.run_until_complete(save_temp_file(upload))
+    try:
+        if not os.path.exists(path):
+            raise RuntimeError("save_temp_file returned a missing file for a mislabelled upload")
+        with open(path, 'rb') as f:
+            samples, _ = decode_wav(f.read())
+        if samples.size == 0:
+            raise RuntimeError("save_temp_file returned an empty WAV for a mislabelled upload")
+    finally:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def bench_predict(recording):
+    """predict_parkinson on one feature row (model artifacts required)."""
+    from app.ml.model_predictor import get_required_features, predict_parkinson
+    from app.utils.voice_data_extraction import extract_voice_features
+
+    features = extract_voice_features(recording['path'], get_required_features())
+    row = {**{k: v for k, v in BASIC_INFO.items() if k != 'name'}, 'sex': 1, **features}
+    predict_parkinson(row)  # loads the model bundle outside the timed loop
+    return lambda: predict_parkinson(row)
+
+
+def bench_voice(recording):
+    """POST /analyze/voice through an in-process test client."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with open(recording['path'], 'rb') as f:
+        content = f.read()
+    client = TestClient(app)
+    client.__enter__()
+    # Time steady-state requests, not the startup warm-up running beside them
+    while client.get('/readyz').json()['status'] == 'starting':
+        time.sleep(0.05)
+
+    def run():
+        response = client.post('/analyze/voice', data=BASIC_INFO, files={
+            'audio_file': (os.path.basename(recording['path']), content, recording['content_type']),
+        })
+        if response.status_code != 200:
+            raise RuntimeError(f"/analyze/voice answered {response.status_code}: {response.text}")
+
+    run.close = lambda: client.__exit__(None, None, None)
+    return run
+
+
+BENCHMARKS = {
+    'extract': bench_extract,
+    'convert': bench_convert,
+    'predict': bench_predict,
+    'voice': bench_voice,
+}
+
+
+def run_benchmark(case, recording, repeat, warmup, verbose=False):
+    """
+    Time one benchmark inside the current process.
+
+    Returns:
+    --------
+    dict : latency samples in milliseconds and peak RSS of this process and
+           of its (terminated) child processes, in MB
+    """
+    with contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, 'w'))))
+        run = BENCHMARKS[case](recording)
+        try:
+            for _ in range(warmup):
+                run()
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                samples.append((time.perf_counter() - start) * 1000.0)
+        finally:
+            close = getattr(run, 'close', None)
+            if close is not None:
+                close()
+
+    return {
+        'samples_ms': samples,
+        'peak_rss_mb': _peak_rss_mb(),
+        'children_peak_rss_mb': _peak_rss_mb(children=True),
+    }
+
+
+def summarize(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'n': int(len(samples)),
+        'mean_ms': float(samples.mean()),
+        'min_ms': float(samples.min()),
+        'p50_ms': float(p50),
+        'p95_ms': float(p95),
+        'p99_ms': float(p99),
+    }
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Compare two result sets on p50, p95 and peak RSS.
+
+    A metric regresses when it grew by more than `tolerance` (relative) and,
+    for latencies, by at least `min_delta_ms`.
+
+    Returns:
+    --------
+    list of dict : one row per benchmark present in both, with the ratios
+                   current / baseline and a `regression` flag
+    """
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        row = {'benchmark': name, 'regression': False}
+        for metric in ('p50_ms', 'p95_ms', 'peak_rss_mb'):
+            if not previous.get(metric):
+                continue
+            ratio = current[metric] / previous[metric]
+            row[metric] = ratio
+            noise = metric.endswith('_ms') and current[metric] - previous[metric] < min_delta_ms
+            if ratio > 1.0 + tolerance and not noise:
+                row['regression'] = True
+        rows.append(row)
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cases', nargs='+', choices=CASES, default=list(CASES))
+    parser.add_argument('--formats', nargs='+', default=None,
+                        help='audio formats (default: every format encodable here)')
+    parser.add_argument('--durations', nargs='+', type=float, default=list(DEFAULT_DURATIONS),
+                        help='recording lengths in seconds')
+    parser.add_argument('--repeat', type=int, default=10, help='timed runs per benchmark')
+    parser.add_argument('--warmup', type=int, default=1, help='untimed runs per benchmark')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed relative slowdown / memory growth before failing')
+    parser.add_argument('--min-delta-ms', type=float, default=DEFAULT_MIN_DELTA_MS,
+                        help='ignore latency differences smaller than this')
+    parser.add_argument('--verbose', action='store_true', help='show output of the code under test')
+    args = parser.parse_args(argv)
+
+    formats = args.formats or available_formats()
+    unknown = set(formats) - set(available_formats())
+    if unknown:
+        parser.error(f"cannot encode {', '.join(sorted(unknown))} here (is ffmpeg installed?)")
+
+    # Measure the uncached analysis path; identical uploads would otherwise
+    # be answered from the feature cache after the first run.
+    os.environ['FEATURE_CACHE_SIZE'] = '0'
+    os.environ['FEATURE_CACHE_DB'] = ''
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='voice-bench-') as workdir:
+        os.environ['JOB_QUEUE_DB'] = os.path.join(workdir, 'jobs.db')
+        corpus = write_corpus(workdir, args.durations, formats)
+        context = multiprocessing.get_context('spawn')
+
+        for case in args.cases:
+            recordings = corpus if PER_RECORDING[case] else corpus[:1]
+            for recording in recordings:
+                name = f"{case}/{recording['name']}" if PER_RECORDING[case] else case
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    try:
+                        measured = executor.submit(run_benchmark, case, recording, args.repeat,
+                                                   args.warmup, args.verbose).result()
+                    except FileNotFoundError as e:
+                        print(f"{name:<32} skipped: {e}")
+                        continue
+                results[name] = {
+                    **summarize(measured['samples_ms']),
+                    'peak_rss_mb': measured['peak_rss_mb'],
+                    'children_peak_rss_mb': measured['children_peak_rss_mb'],
+                }
+                _print_result(name, results[name])
+
+    report = {'meta': _metadata(args, formats), 'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        rows = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        _print_comparison(rows)
+        if any(row['regression'] for row in rows):
+            return 1
+    return 0
+
+
+def _peak_rss_mb(children=False):
+    import resource
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return usage.ru_maxrss / divisor
+
+
+def _metadata(args, formats):
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'cases': list(args.cases),
+        'formats': list(formats),
+        'durations': list(args.durations),
+        'repeat': args.repeat,
+        'warmup': args.warmup,
+    }
+
+
+def _print_result(name, result):
+    print(f"{name:<32} p50 {result['p50_ms']:9.2f} ms  p95 {result['p95_ms']:9.2f} ms  "
+          f"p99 {result['p99_ms']:9.2f} ms  peak RSS {result['peak_rss_mb']:7.1f} MB")
+
+
+def _print_comparison(rows):
+    print("\nCompared to baseline (current / baseline):")
+    for row in rows:
+        ratios = "  ".join(f"{metric.rsplit('_', 1)[0]} {row[metric]:5.2f}x"
+                           for metric in ('p50_ms', 'p95_ms', 'peak_rss_mb') if metric in row)
+        flag = "  REGRESSION" if row['regression'] else ""
+        print(f"{row['benchmark']:<32} {ratios}{flag}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())